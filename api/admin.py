@@ -1,10 +1,30 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, ExerciseType, Exercise, Workout, WorkoutExercise, WorkoutLog, Phase, CyclePhase, Cycle, CycleLog, CycleLogSymptom, Symptom
+from .pagination import EstimatedCountPaginator
+from .models import CustomUser, ExerciseType, Exercise, Workout, WorkoutExercise, WorkoutTemplate, WorkoutTemplateExercise, WorkoutLog, Phase, CyclePhase, Cycle, CycleLog, CycleLogSymptom, Symptom, Job
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin for tables that grow with every user: no exact COUNT(*) over the whole table"""
+    paginator = EstimatedCountPaginator
+    # Skip the second COUNT(*) admin runs to show "N of M" on filtered lists
+    show_full_result_count = False
+
+    def get_list_select_related(self, request):
+        """Select everything the labels of each row and of its foreign key columns show"""
+        related = set(getattr(self.model, 'label_related', ()))
+        for name in self.list_display:
+            field = next((field for field in self.model._meta.concrete_fields if field.name == name), None)
+            if field is not None and field.is_relation:
+                related.add(name)
+                related.update(f"{name}__{path}" for path in getattr(field.related_model, 'label_related', ()))
+        return sorted(related)
 
 
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_display = ("name","email", "is_staff", "is_active")
     list_filter = ("is_staff", "is_active")
     ordering = ("email",)
@@ -32,16 +52,33 @@ class ExerciseTypeAdmin(admin.ModelAdmin):
 @admin.register(Exercise)
 class ExerciseAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'exercise_type')
+    list_select_related = ('exercise_type',)
+    search_fields = ('name',)
+
+
+class WorkoutTemplateExerciseInline(admin.TabularInline):
+    model = WorkoutTemplateExercise
+    extra = 1
+
+
+@admin.register(WorkoutTemplate)
+class WorkoutTemplateAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'created_at')
+    inlines = [WorkoutTemplateExerciseInline]
 
 
 @admin.register(Workout)
-class WorkoutAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'user', 'created_at')
+class WorkoutAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'user', 'template', 'created_at')
+    raw_id_fields = ('user', 'template')
+    date_hierarchy = 'created_at'
 
 
 @admin.register(WorkoutExercise)
-class WorkoutExerciseAdmin(admin.ModelAdmin):
+class WorkoutExerciseAdmin(LargeTableAdmin):
     list_display = ('id', 'workout', 'exercise', 'reps', 'sets', 'weight')
+    raw_id_fields = ('workout',)
+    autocomplete_fields = ('exercise',)
 
 
 @admin.register(Phase)
@@ -50,18 +87,27 @@ class PhaseAdmin(admin.ModelAdmin):
 
 
 @admin.register(Cycle)
-class CycleAdmin(admin.ModelAdmin):
+class CycleAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'start_date', 'cycle_length')
+    raw_id_fields = ('user',)
+    date_hierarchy = 'start_date'
 
 
 @admin.register(CyclePhase)
-class CyclePhaseAdmin(admin.ModelAdmin):
+class CyclePhaseAdmin(LargeTableAdmin):
     list_display = ('id', 'cycle', 'phase', 'start_date', 'end_date')
+    raw_id_fields = ('cycle',)
+    date_hierarchy = 'start_date'
 
 
 @admin.register(CycleLog)
-class CycleLogAdmin(admin.ModelAdmin):
+class CycleLogAdmin(LargeTableAdmin):
     list_display = ('id', 'cycle_phase', 'date', 'get_symptoms')
+    raw_id_fields = ('cycle_phase',)
+    date_hierarchy = 'date'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('symptoms')
 
     def get_symptoms(self, obj):
         return ", ".join([symptom.symptom_name for symptom in obj.symptoms.all()])
@@ -74,5 +120,13 @@ class SymptomAdmin(admin.ModelAdmin):
 
 
 @admin.register(CycleLogSymptom)
-class CycleLogSymptomAdmin(admin.ModelAdmin):
+class CycleLogSymptomAdmin(LargeTableAdmin):
     list_display = ('id', 'cycle_log', 'symptom')
+    raw_id_fields = ('cycle_log',)
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'user', 'status', 'attempts', 'created_at', 'finished_at')
+    raw_id_fields = ('user',)
+    list_filter = ('status', 'name')
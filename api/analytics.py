@@ -0,0 +1,155 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, DurationField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import CycleLog, CycleLogSymptom, CyclePhase, SymptomRollup, WorkoutExercise, WorkoutLog, WorkoutTemplateExercise
+
+# Number of rollup rows written per INSERT during a rebuild
+REBUILD_BATCH_SIZE = 1000
+
+
+def _rollup_key(cycle_log_id, symptom_id):
+    """Return the rollup lookup for a symptom logged on a cycle log, or None if the log no longer exists"""
+    log = CycleLog.objects.filter(pk=cycle_log_id).values(
+        'date',
+        'cycle_phase__phase_id',
+        'cycle_phase__cycle__user_id',
+        'cycle_phase__cycle__start_date',
+    ).first()
+
+    if log is None:
+        return None
+
+    return {
+        'user_id': log['cycle_phase__cycle__user_id'],
+        'phase_id': log['cycle_phase__phase_id'],
+        'symptom_id': symptom_id,
+        'cycle_day': (log['date'] - log['cycle_phase__cycle__start_date']).days + 1,
+    }
+
+
+def record_symptom(cycle_log_symptom):
+    """Increment the rollup count for a newly logged symptom"""
+    key = _rollup_key(cycle_log_symptom.cycle_log_id, cycle_log_symptom.symptom_id)
+    if key is None:
+        return
+
+    with transaction.atomic():
+        SymptomRollup.objects.get_or_create(**key)
+        SymptomRollup.objects.filter(**key).update(count=F('count') + 1)
+
+
+def unrecord_symptom(cycle_log_symptom):
+    """Decrement the rollup count for a removed symptom"""
+    key = _rollup_key(cycle_log_symptom.cycle_log_id, cycle_log_symptom.symptom_id)
+    if key is None:
+        return
+
+    SymptomRollup.objects.filter(count__gt=0, **key).update(count=F('count') - 1)
+
+
+def rebuild_symptom_rollups(user=None):
+    """Recompute the symptom rollups from the cycle logs, for one user or for everyone"""
+    rollups = SymptomRollup.objects.all()
+    log_symptoms = CycleLogSymptom.objects.all()
+
+    if user is not None:
+        rollups = rollups.filter(user=user)
+        log_symptoms = log_symptoms.filter(cycle_log__cycle_phase__cycle__user=user)
+
+    # Group on the offset of the log date from the cycle start so the database does the counting
+    counts = log_symptoms.annotate(
+        day_offset=ExpressionWrapper(
+            F('cycle_log__date') - F('cycle_log__cycle_phase__cycle__start_date'),
+            output_field=DurationField(),
+        ),
+    ).values(
+        'cycle_log__cycle_phase__cycle__user_id',
+        'cycle_log__cycle_phase__phase_id',
+        'symptom_id',
+        'day_offset',
+    ).annotate(total=Count('id')).order_by()
+
+    new_rollups = [
+        SymptomRollup(
+            user_id=row['cycle_log__cycle_phase__cycle__user_id'],
+            phase_id=row['cycle_log__cycle_phase__phase_id'],
+            symptom_id=row['symptom_id'],
+            cycle_day=row['day_offset'].days + 1,
+            count=row['total'],
+        )
+        for row in counts.iterator()
+    ]
+
+    with transaction.atomic():
+        rollups.delete()
+        SymptomRollup.objects.bulk_create(new_rollups, batch_size=REBUILD_BATCH_SIZE)
+
+    return len(new_rollups)
+
+
+def symptom_summary(rollups):
+    """Summarise symptom counts by phase and by cycle day from a rollup queryset"""
+    rollups = rollups.filter(count__gt=0)
+
+    by_phase = {}
+    for row in rollups.values('phase__name', 'symptom__symptom_name').annotate(total=Sum('count')).order_by():
+        phase_name = row['phase__name'] or 'No Phase'
+        by_phase.setdefault(phase_name, {})[row['symptom__symptom_name']] = row['total']
+
+    by_cycle_day = {}
+    for row in rollups.values('cycle_day', 'symptom__symptom_name').annotate(total=Sum('count')).order_by('cycle_day'):
+        by_cycle_day.setdefault(row['cycle_day'], {})[row['symptom__symptom_name']] = row['total']
+
+    return {
+        "by_phase": by_phase,
+        "by_cycle_day": by_cycle_day,
+    }
+
+
+def _volume_subquery(exercises, group_by):
+    """Subquery summing sets x reps x weight over a queryset of workout or template exercises"""
+    volume_field = DecimalField(max_digits=12, decimal_places=2)
+    return Subquery(
+        exercises.values(group_by).annotate(
+            total=Sum(ExpressionWrapper(
+                F('sets') * F('reps') * Coalesce('weight', Value(Decimal('0'))),
+                output_field=volume_field,
+            )),
+        ).values('total'),
+        output_field=volume_field,
+    )
+
+
+def phase_training_volume(user, start_date, end_date):
+    """Summarise workout sessions and training volume (sets x reps x weight) per cycle phase over a date range"""
+    # Phase the user was in on the date of each workout log
+    phase_name = Subquery(
+        CyclePhase.objects.filter(
+            cycle__user=OuterRef('user'),
+            start_date__lte=OuterRef('date'),
+            end_date__gte=OuterRef('date'),
+        ).order_by('-start_date').values('phase__name')[:1]
+    )
+
+    # Total volume of the logged workout, summed by the database, falling back to its shared template
+    workout_volume = Coalesce(
+        _volume_subquery(WorkoutExercise.objects.filter(workout=OuterRef('workout')), 'workout'),
+        _volume_subquery(WorkoutTemplateExercise.objects.filter(template=OuterRef('workout__template')), 'template'),
+    )
+
+    rows = WorkoutLog.objects.filter(user=user, date__range=(start_date, end_date)).annotate(
+        phase_name=phase_name,
+        workout_volume=workout_volume,
+    ).values('phase_name').annotate(
+        sessions=Count('id'),
+        volume=Sum('workout_volume'),
+    ).order_by()
+
+    return {
+        (row['phase_name'] or 'No Phase'): {
+            "sessions": row['sessions'],
+            "volume": row['volume'] or Decimal('0'),
+        }
+        for row in rows
+    }
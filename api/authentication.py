@@ -0,0 +1,18 @@
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+
+class OptionalJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that treats an unusable token as anonymous instead of rejecting the request.
+
+    A user whose account is being deleted is deactivated first, so their token stops
+    authenticating while they may still be polling the deletion job.
+    """
+
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return None
@@ -0,0 +1,422 @@
+import importlib
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date as Date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signals
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from .analytics import phase_training_volume
+from .caching import get_catalogue_blob
+from .compression import available_encodings, compress
+from .cycles import phase_lengths, recompute_cycles
+from .deletion import delete_account
+from .models import Cycle, CyclePhase, WorkoutLog
+from .renderers import MessagePackRenderer
+from .search import ExerciseIndex
+from .startup import measure_startup
+from .synthetic import create_synthetic_user
+from .throttling import CacheBucketStore, SharedMemoryBucketStore
+
+# Registry of benchmarks runnable with `python manage.py benchmark <name>`
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark function under `name`"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def time_call(func, repeat=5):
+    """Call `func` `repeat` times and return (best milliseconds, query count of the last call, last result)"""
+    best = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = func()
+            elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(queries), result
+
+
+def report(write, label, millis, queries=None):
+    """Write a single benchmark result line"""
+    line = f"{label:<48} {millis:>10.2f} ms"
+    if queries is not None:
+        line += f" {queries:>8} queries"
+    write(line)
+
+
+def _training_volume_python(user, start_date, end_date):
+    """Reference implementation looping over ORM objects, used as the benchmark baseline"""
+    summary = {}
+    for log in WorkoutLog.objects.filter(user=user, date__range=(start_date, end_date)):
+        cycle_phase = CyclePhase.objects.filter(
+            cycle__user=user, start_date__lte=log.date, end_date__gte=log.date,
+        ).order_by('-start_date').first()
+        phase_name = cycle_phase.phase.name if cycle_phase and cycle_phase.phase else 'No Phase'
+
+        volume = sum(
+            (exercise.sets * exercise.reps * (exercise.weight or Decimal('0')) for exercise in log.workout.get_exercises()),
+            Decimal('0'),
+        )
+        entry = summary.setdefault(phase_name, {"sessions": 0, "volume": Decimal('0')})
+        entry["sessions"] += 1
+        entry["volume"] += volume
+    return summary
+
+
+@benchmark('training_volume')
+def training_volume(write, options):
+    """Compare the database-aggregated training volume report with a Python loop over ORM objects"""
+    user = create_synthetic_user('benchmark-volume@example.com', years=options['years'], seed=0)
+    end_date = Date.today()
+    start_date = end_date - timedelta(days=365 * options['years'])
+    write(f"{WorkoutLog.objects.filter(user=user).count()} workout logs over {options['years']} years")
+
+    millis, queries, aggregated = time_call(lambda: phase_training_volume(user, start_date, end_date), options['repeat'])
+    report(write, "database aggregation", millis, queries)
+
+    millis, queries, looped = time_call(lambda: _training_volume_python(user, start_date, end_date), 1)
+    report(write, "python loop over ORM objects", millis, queries)
+
+    if aggregated != looped:
+        write("WARNING: aggregated and looped results differ")
+
+
+@benchmark('exercise_search')
+def exercise_search(write, options):
+    """Time lookups against an in-memory index of a large synthetic exercise catalogue"""
+    rng = random.Random(0)
+    movements = ["Squat", "Deadlift", "Press", "Curl", "Row", "Lunge", "Extension", "Raise", "Fly", "Pulldown"]
+    modifiers = ["Barbell", "Dumbbell", "Cable", "Machine", "Single-Leg", "Incline", "Seated", "Standing", "Sumo", "Banded"]
+    types = [(1, "Compound"), (2, "Isolation"), (3, "Light Cardio"), (4, "Heavy Cardio")]
+    exercises = [
+        (i, f"{rng.choice(modifiers)} {rng.choice(modifiers)} {rng.choice(movements)} {i}", *rng.choice(types))
+        for i in range(5000)
+    ]
+
+    start = time.perf_counter()
+    index = ExerciseIndex(exercises)
+    report(write, f"build index ({len(exercises)} exercises)", (time.perf_counter() - start) * 1000)
+
+    for label, query, exercise_type in [
+        ("prefix 'dumb'", "dumb", None),
+        ("prefix 'press' filtered by type", "press", 1),
+        ("fuzzy 'dedlift'", "dedlift", None),
+        ("fuzzy 'sated cabel row'", "sated cabel row", None),
+    ]:
+        millis, _, matches = time_call(lambda: index.search(query, exercise_type=exercise_type), options['repeat'])
+        report(write, f"{label} ({len(matches)} hits)", millis)
+
+
+def _simulate_requests(requests, latencies):
+    """Run `requests` request cycles on this thread's connection, recording each one's latency"""
+    for _ in range(requests):
+        start = time.perf_counter()
+        # The same signals Django sends around every request, which close obsolete connections
+        signals.request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        signals.request_finished.send(sender=None)
+        latencies.append((time.perf_counter() - start) * 1000)
+    connections.close_all()
+
+
+@benchmark('connections')
+def connection_reuse(write, options):
+    """Compare request latency under concurrent load with and without persistent database connections"""
+    settings_dict = connection.settings_dict
+    original_max_age = settings_dict['CONN_MAX_AGE']
+    write(f"{connection.vendor} database, {options['concurrency']} threads x {options['requests']} requests")
+
+    try:
+        for label, max_age in [("new connection per request", 0), ("persistent connections", 600)]:
+            settings_dict['CONN_MAX_AGE'] = max_age
+            latencies = []
+            threads = [
+                threading.Thread(target=_simulate_requests, args=(options['requests'], latencies))
+                for _ in range(options['concurrency'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            latencies.sort()
+            report(write, f"{label} (median)", latencies[len(latencies) // 2])
+            report(write, f"{label} (p95)", latencies[int(len(latencies) * 0.95)])
+    finally:
+        settings_dict['CONN_MAX_AGE'] = original_max_age
+
+
+def _measure_deletion(write, label, delete):
+    """Report time, query count and peak Python memory of one account deletion"""
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        delete()
+        millis = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report(write, label, millis, len(queries))
+    write(f"{'':<48} {peak / 1024 / 1024:>10.2f} MB peak")
+
+
+@benchmark('account_deletion')
+def account_deletion(write, options):
+    """Compare deleting a heavy account through Django's collector with the set-based pipeline"""
+    collected = create_synthetic_user('benchmark-delete-1@example.com', years=options['years'], seed=0)
+    pipelined = create_synthetic_user('benchmark-delete-2@example.com', years=options['years'], seed=0)
+    write(f"two users with {options['years']} years of data each")
+
+    _measure_deletion(write, "user.delete() (collector)", collected.delete)
+    _measure_deletion(write, "delete_account() (set-based batches)", lambda: delete_account(pipelined.pk))
+
+
+def _recompute_cycles_per_phase(user):
+    """Reference implementation saving each phase and cycle in turn, used as the benchmark baseline"""
+    for cycle in Cycle.objects.filter(user=user):
+        start_date = cycle.start_date
+        total_cycle_length = 0
+        for phase_name, length in phase_lengths(user):
+            phase = cycle.phases.filter(phase__name=phase_name).first()
+            if phase:
+                phase.start_date = start_date
+                phase.end_date = start_date + timedelta(days=length - 1)
+                phase.save()
+                total_cycle_length += length
+                start_date = phase.end_date + timedelta(days=1)
+        cycle.cycle_length = total_cycle_length
+        cycle.save()
+
+
+@benchmark('cycle_recompute')
+def cycle_recompute(write, options):
+    """Compare recomputing every cycle of a user one phase at a time with the bulk recompute"""
+    user = create_synthetic_user('benchmark-cycles@example.com', years=options['years'], seed=0)
+    write(f"one user with {Cycle.objects.filter(user=user).count()} cycles")
+
+    for menstrual_length in (user.menstrual_length - 2, user.menstrual_length):
+        user.menstrual_length = menstrual_length
+        millis, queries, _ = time_call(lambda: _recompute_cycles_per_phase(user), repeat=1)
+        report(write, f"per-phase saves (menstrual {menstrual_length} days)", millis, queries)
+        millis, queries, (_, logs_moved) = time_call(lambda: recompute_cycles(user), repeat=1)
+        report(write, f"recompute_cycles() (menstrual {menstrual_length} days)", millis, queries)
+        write(f"  {logs_moved} logs moved to another phase")
+
+
+@benchmark('throttle')
+def throttle(write, options):
+    """Measure the cost of one token bucket check in each store"""
+    checks = options['requests'] * 50
+    keys = [f"throttle_benchmark_{index}" for index in range(1000)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        stores = [
+            ("shared memory", SharedMemoryBucketStore(os.path.join(directory, 'buckets'))),
+            ("cache (default backend)", CacheBucketStore()),
+        ]
+        for label, store in stores:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for index in range(checks):
+                    store.consume(keys[index % len(keys)], 600, 10.0)
+                elapsed = time.perf_counter() - start
+            write(f"{label:<48} {elapsed / checks * 1e6:>10.2f} us/check {len(queries):>8} queries")
+
+
+def _data_queries(queries):
+    """Count captured statements other than the savepoints the benchmark's rollback transaction adds"""
+    return sum(1 for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')))
+
+
+def _register_check_first(email, password, name):
+    """Reference implementation checking for the email before creating the user, used as the benchmark baseline"""
+    User = get_user_model()
+    if User.objects.filter(email=email).exists():
+        return None
+    return User.objects.create_user(email=email, password=password, name=name)
+
+
+@benchmark('signup')
+def signup(write, options):
+    """Compare signing up with an existence check first against a single insert relying on the unique index"""
+    User = get_user_model()
+    signups = options['repeat']
+
+    for label, register in [
+        ("exists() then create_user()", _register_check_first),
+        ("register() (single insert)", User.objects.register),
+    ]:
+        prefix = label.split()[0].strip('()')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for index in range(signups):
+                register(email=f"benchmark-signup-{prefix}-{index}@example.com", password="benchmark-password", name="Benchmark")
+            elapsed = time.perf_counter() - start
+        report(write, label, elapsed * 1000 / signups, _data_queries(queries) // signups)
+        write(f"  {signups / elapsed:.1f} signups/sec")
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        try:
+            User.objects.register(email="BENCHMARK-SIGNUP-register-0@example.com", password="benchmark-password", name="Benchmark")
+        except IntegrityError:
+            pass
+        report(write, "register() with a duplicate email", (time.perf_counter() - start) * 1000, _data_queries(queries))
+
+
+def _collect_static(storages, finders):
+    """Run collectstatic into a fresh directory, returning (seconds, {path: {encoding: bytes}})"""
+    with tempfile.TemporaryDirectory() as static_root:
+        with override_settings(STATIC_ROOT=static_root, STORAGES=storages, STATICFILES_FINDERS=finders):
+            start = time.perf_counter()
+            call_command('collectstatic', interactive=False, verbosity=0)
+            elapsed = time.perf_counter() - start
+
+            sizes = {}
+            for directory, _, files in os.walk(static_root):
+                for name in files:
+                    path = os.path.relpath(os.path.join(directory, name), static_root)
+                    base, encoding = (path[:-3], 'br') if path.endswith('.br') else (path[:-3], 'gzip') if path.endswith('.gz') else (path, 'identity')
+                    sizes.setdefault(base, {})[encoding] = os.path.getsize(os.path.join(directory, name))
+    return elapsed, sizes
+
+
+@benchmark('static_files')
+def static_files(write, options):
+    """Compare a cold collectstatic and the bytes needed to fetch every collected asset, before and after the pipeline"""
+    storages = {**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+    django_finders = ['django.contrib.staticfiles.finders.FileSystemFinder', 'django.contrib.staticfiles.finders.AppDirectoriesFinder']
+
+    for label, build_storages, build_finders in [
+        ("plain collectstatic, all assets", storages, django_finders),
+        ("hashed + br/gzip, unused assets stripped", settings.STORAGES, settings.STATICFILES_FINDERS),
+    ]:
+        elapsed, sizes = _collect_static(build_storages, build_finders)
+        # staticfiles.json is read by the server only
+        sizes = {path: encodings for path, encodings in sizes.items() if not path.endswith('staticfiles.json')}
+        report(write, label, elapsed * 1000)
+        write(f"  {len(sizes)} assets, {sum(encodings['identity'] for encodings in sizes.values()) / 1024:.0f} KiB uncompressed, "
+              f"{sum(min(encodings.values()) for encodings in sizes.values()) / 1024:.0f} KiB sent to a client accepting br")
+
+
+COMPRESSION_ENDPOINTS = ['/api/workouts/', '/api/workout-logs/', '/api/cycles/', '/api/period-dates/', '/api/cycle-data/']
+
+
+@benchmark('compression')
+def compression(write, options):
+    """Measure CPU time and bytes saved per encoding for the JSON of the main list endpoints"""
+    from rest_framework.test import APIClient
+
+    user = create_synthetic_user('benchmark-compression@example.com', years=options['years'], seed=0)
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user)
+
+    bodies = [(path, client.get(path).content) for path in COMPRESSION_ENDPOINTS]
+    for path, body in bodies:
+        write(f"{path} ({len(body) / 1024:.1f} KiB)")
+        for encoding in available_encodings():
+            level = settings.COMPRESSION_LEVELS[encoding]
+            millis, _, compressed = time_call(lambda: compress(body, encoding), repeat=options['repeat'])
+            write(f"  {f'{encoding} level {level}':<46} {millis * 1000:>10.1f} us {len(compressed):>9} bytes "
+                  f"({100 - len(compressed) * 100 / len(body):.0f}% saved)")
+
+    blob = get_catalogue_blob()
+    write(f"/api/exercises/ ({len(blob['body']) / 1024:.1f} KiB, compressed once per catalogue version)")
+    for encoding, compressed in blob['encoded'].items():
+        write(f"  {encoding:<46} {'cached':>13} {len(compressed):>9} bytes ({100 - len(compressed) * 100 / len(blob['body']):.0f}% saved)")
+
+
+@benchmark('api_profile')
+def api_profile(write, options):
+    """Compare per-request overhead and worker start up of the full and API-only settings profiles"""
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    user = get_user_model().objects.create_user(email='benchmark-profile@example.com', password='benchmark', name='Benchmark')
+    authorization = f"Bearer {AccessToken.for_user(user)}"
+    requests = options['requests']
+
+    for label, settings_module in [("full profile", 'cyclesync.settings'), ("API-only profile", 'cyclesync.settings_api')]:
+        profile = importlib.import_module(settings_module)
+        # One user sends every request. Views keep their throttle classes from import time, but the
+        # rates are read per request, so a rate of None turns throttling off and no 429s get timed
+        rest_framework = {
+            **profile.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {**profile.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'user': None},
+        }
+        with override_settings(MIDDLEWARE=profile.MIDDLEWARE, ROOT_URLCONF=profile.ROOT_URLCONF, REST_FRAMEWORK=rest_framework):
+            client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=authorization)
+            # The first request builds the middleware chain and imports the URLconf
+            client.get('/api/user/')
+            with CaptureQueriesContext(connection) as queries:
+                millis, _, responses = time_call(lambda: [client.get('/api/user/') for _ in range(requests)], repeat=options['repeat'])
+            write(f"{label} ({len(profile.MIDDLEWARE)} middleware, {len(profile.INSTALLED_APPS)} apps)")
+            write(f"  {'GET /api/user/ with a JWT':<46} {millis * 1000 / requests:>10.1f} us/request "
+                  f"{_data_queries(queries) // (requests * options['repeat']):>5} queries")
+            failed = sum(response.status_code != 200 for response in responses)
+            if failed:
+                write(f"  {failed} of {requests} timed responses were not 200 OK; the timing above is not of real responses")
+
+        runs = [measure_startup(settings_module) for _ in range(options['repeat'])]
+        report(write, "  worker start up to first response (best)", min(sum(run['timings'].values()) - run['timings']['second_request'] for run in runs))
+        write(f"  {runs[0]['modules']} modules imported")
+
+
+PAGINATED_ENDPOINTS = ['/api/workouts/', '/api/workout-logs/', '/api/cycles/', '/api/period-dates/', '/api/exercises/']
+
+
+@benchmark('list_pagination')
+def list_pagination(write, options):
+    """Compare whole-list responses with the first and last keyset pages of the list endpoints"""
+    from rest_framework.test import APIClient
+
+    user = create_synthetic_user('benchmark-pagination@example.com', years=options['years'], seed=0)
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user)
+
+    for path in PAGINATED_ENDPOINTS:
+        # Walk the cursors to the end so the last page can be timed too
+        last_page, pages = f"{path}?page_size=50", 1
+        while (next_link := client.get(last_page).data['next']) is not None:
+            last_page, pages = next_link, pages + 1
+
+        write(f"{path} ({pages} pages of 50)")
+        for label, url in [("whole list", path), ("first page", f"{path}?page_size=50"), ("last page", last_page)]:
+            millis, queries, response = time_call(lambda: client.get(url), repeat=options['repeat'])
+            report(write, f"  {label} ({len(response.content) / 1024:.1f} KiB)", millis, queries)
+
+
+MESSAGEPACK_ENDPOINTS = ['/api/workout-logs/', '/api/period-dates/']
+
+
+@benchmark('msgpack')
+def msgpack_encoding(write, options):
+    """Compare the size and encode time of JSON and MessagePack bodies of the date-heavy lists"""
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+
+    user = create_synthetic_user('benchmark-msgpack@example.com', years=options['years'], seed=0)
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user)
+
+    for path in MESSAGEPACK_ENDPOINTS:
+        data = client.get(path).data
+        write(path)
+        for label, renderer in [("JSON", JSONRenderer()), ("MessagePack", MessagePackRenderer())]:
+            millis, _, body = time_call(lambda: renderer.render(data), repeat=options['repeat'])
+            compressed = {encoding: len(compress(body, encoding)) for encoding in available_encodings()}
+            write(f"  {label:<46} {millis * 1000:>10.1f} us {len(body):>9} bytes "
+                  f"({', '.join(f'{encoding} {size}' for encoding, size in compressed.items())})")
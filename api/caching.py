@@ -0,0 +1,85 @@
+import hashlib
+import uuid
+from django.core.cache import cache
+from .compression import MAX_LEVELS, available_encodings, compress
+
+# Serialized template payloads only change when an admin edits the template
+TEMPLATE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# The exercise catalogue only changes when an admin edits it. With a per-process cache
+# the timeout bounds how long other workers keep serving a stale version.
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+CATALOGUE_VERSION_KEY = "exercise_catalogue:version"
+
+
+def template_cache_key(template_id):
+    return f"workout_template:{template_id}"
+
+
+def get_template_payloads(template_ids):
+    """Return the serialized templates in the given order, serializing and caching any misses in one query"""
+    from .models import WorkoutTemplate
+    from .serializers import WorkoutTemplateSerializer
+
+    cached = cache.get_many([template_cache_key(template_id) for template_id in template_ids])
+    payloads = {template_id: cached.get(template_cache_key(template_id)) for template_id in template_ids}
+    missing = [template_id for template_id, payload in payloads.items() if payload is None]
+
+    if missing:
+        templates = WorkoutTemplate.objects.filter(id__in=missing).prefetch_related('template_exercises__exercise__exercise_type')
+        serialized = {template.id: WorkoutTemplateSerializer(template).data for template in templates}
+        cache.set_many({template_cache_key(template_id): payload for template_id, payload in serialized.items()}, TEMPLATE_CACHE_TIMEOUT)
+        payloads.update(serialized)
+
+    return [payloads[template_id] for template_id in template_ids if payloads[template_id] is not None]
+
+
+def get_template_payload(template_id):
+    """Return the serialized template, serializing and caching it on a miss"""
+    payloads = get_template_payloads([template_id])
+    if not payloads:
+        raise LookupError(f"Workout template {template_id} does not exist")
+    return payloads[0]
+
+
+def invalidate_template_payload(template_id):
+    cache.delete(template_cache_key(template_id))
+
+
+def get_catalogue_version():
+    """Return the current exercise catalogue version, starting a new one if none is cached"""
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(CATALOGUE_VERSION_KEY, version, CATALOGUE_CACHE_TIMEOUT)
+        version = cache.get(CATALOGUE_VERSION_KEY, version)
+    return version
+
+
+def bump_catalogue_version():
+    """Start a new catalogue version so the next request rebuilds the catalogue"""
+    cache.set(CATALOGUE_VERSION_KEY, uuid.uuid4().hex, CATALOGUE_CACHE_TIMEOUT)
+
+
+def get_catalogue_blob():
+    """Return the exercise catalogue as a dict with its JSON bytes, compressed bytes and ETag, building it on a miss"""
+    key = f"exercise_catalogue:v2:{get_catalogue_version()}"
+    blob = cache.get(key)
+
+    if blob is None:
+        from rest_framework.renderers import JSONRenderer
+        from .models import Exercise
+        from .serializers import ExerciseSerializer
+
+        exercises = Exercise.objects.select_related('exercise_type').order_by('id')
+        body = JSONRenderer().render(ExerciseSerializer(exercises, many=True).data)
+        blob = {
+            "body": body,
+            # Pre-compressed once per catalogue version, keyed by Content-Encoding
+            "encoded": {encoding: compress(body, encoding, MAX_LEVELS[encoding]) for encoding in available_encodings()},
+            # Content based so every worker hands out the same ETag for the same catalogue
+            "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+        }
+        cache.set(key, blob, CATALOGUE_CACHE_TIMEOUT)
+
+    return blob
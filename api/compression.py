@@ -0,0 +1,66 @@
+"""
+Content-Encoding negotiation and compression for API responses.
+
+gzip is always available. Brotli needs the `Brotli` package and zstd the optional `zstandard`
+package; encodings whose package is missing are never offered.
+"""
+
+import gzip
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Preferred first when a client accepts several equally
+ENCODINGS = ['br', 'zstd', 'gzip']
+
+# Levels for bodies compressed once and cached, where size matters more than CPU
+MAX_LEVELS = {'br': 11, 'zstd': 19, 'gzip': 9}
+
+
+def available_encodings():
+    """Encodings this process can produce, in order of preference"""
+    return [encoding for encoding in ENCODINGS if encoding == 'gzip' or (brotli if encoding == 'br' else zstandard)]
+
+
+def negotiate(accept_encoding, encodings=None):
+    """Return the best encoding from `encodings` allowed by an Accept-Encoding header, or None"""
+    encodings = available_encodings() if encodings is None else encodings
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    best = None
+    for encoding in encodings:
+        quality = accepted.get(encoding, wildcard)
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def compress(body, encoding, level=None):
+    """Compress bytes with an encoding, at the configured level unless one is given"""
+    if level is None:
+        level = settings.COMPRESSION_LEVELS[encoding]
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=level, mtime=0)
@@ -0,0 +1,111 @@
+from datetime import date as Date, timedelta
+from django.db import transaction
+from .analytics import rebuild_symptom_rollups
+from .models import Cycle, CyclePhase, CycleLog
+
+# The phase period logs are recorded in
+PERIOD_PHASE = "Menstrual"
+
+
+def phase_lengths(user):
+    """Return the user's (phase name, length in days) pairs in cycle order"""
+    return [
+        ("Menstrual", user.menstrual_length),
+        ("Follicular", user.follicular_length),
+        ("Ovulatory", user.ovulation_length),
+        ("Luteal", user.luteal_length),
+    ]
+
+
+def _phase_for_date(phases, date):
+    """Return the phase covering date, or the last phase for dates past the end of the cycle"""
+    for phase in phases:
+        if phase.start_date <= date <= phase.end_date:
+            return phase
+    return phases[-1] if date > phases[-1].end_date else phases[0]
+
+
+@transaction.atomic
+def recompute_cycles(user, cycles=None):
+    """
+    Recalculate the phase boundaries and length of the user's cycles from their phase lengths.
+
+    Recomputes every cycle of the user unless a queryset of cycles is given. Phases and cycle
+    lengths are written with bulk updates, and logs that now fall in a different phase are moved
+    to it, so the number of queries does not grow with the number of cycles. Period logs, the
+    ones in the Menstrual phase, record the days the user logged a period and are never moved,
+    nor is any other log moved into the Menstrual phase.
+    Returns the cycles and the number of logs moved.
+    """
+    if cycles is None:
+        cycles = Cycle.objects.filter(user=user)
+    cycles = list(cycles.order_by('start_date'))
+    if not cycles:
+        return [], 0
+
+    order = {name: index for index, (name, _) in enumerate(phase_lengths(user))}
+    lengths = dict(phase_lengths(user))
+
+    phases_by_cycle = {}
+    for phase in CyclePhase.objects.filter(cycle__in=cycles).select_related('phase'):
+        if phase.phase and phase.phase.name in order:
+            phases_by_cycle.setdefault(phase.cycle_id, []).append(phase)
+
+    updated_phases = []
+    for cycle in cycles:
+        phases = sorted(phases_by_cycle.get(cycle.pk, []), key=lambda phase: order[phase.phase.name])
+        phases_by_cycle[cycle.pk] = phases
+        start_date = cycle.start_date
+        total_cycle_length = 0
+
+        for phase in phases:
+            length = lengths[phase.phase.name]
+            phase.start_date = start_date
+            phase.end_date = start_date + timedelta(days=length - 1)
+            total_cycle_length += length
+            start_date = phase.end_date + timedelta(days=1)
+            updated_phases.append(phase)
+
+        cycle.cycle_length = total_cycle_length
+
+    CyclePhase.objects.bulk_update(updated_phases, ['start_date', 'end_date'])
+    Cycle.objects.bulk_update(cycles, ['cycle_length'])
+
+    # Move logs whose date now falls in another phase of the same cycle. Period logs stay in the
+    # Menstrual phase however its length changes, as /api/period-dates/ lists that phase's logs
+    cycle_of_phase = {phase.pk: phase.cycle_id for phases in phases_by_cycle.values() for phase in phases}
+    logs = list(
+        CycleLog.objects.filter(cycle_phase__cycle__in=cycles)
+        .exclude(cycle_phase__phase__name=PERIOD_PHASE)
+        .only('id', 'cycle_phase_id', 'date')
+    )
+    taken = {(log.cycle_phase_id, log.date) for log in logs}
+    moved_logs = []
+    for log in logs:
+        phases = phases_by_cycle.get(cycle_of_phase.get(log.cycle_phase_id))
+        if not phases:
+            continue
+        target = _phase_for_date(phases, log.date)
+        if target.phase.name == PERIOD_PHASE:
+            continue
+        # Leave a log in place rather than merge it into one already logged for that phase and date
+        if target.pk != log.cycle_phase_id and (target.pk, log.date) not in taken:
+            taken.discard((log.cycle_phase_id, log.date))
+            taken.add((target.pk, log.date))
+            log.cycle_phase_id = target.pk
+            moved_logs.append(log)
+
+    if moved_logs:
+        CycleLog.objects.bulk_update(moved_logs, ['cycle_phase'])
+        # The rollups count symptoms per phase, which just changed for the moved logs
+        rebuild_symptom_rollups(user=user)
+
+    return cycles, len(moved_logs)
+
+
+def recompute_current_cycle(user):
+    """Recalculate the phases and length of the user's current cycle from their phase lengths"""
+    today = Date.today()
+    current_cycle = Cycle.objects.filter(user=user, start_date__lte=today).order_by('-start_date')[:1]
+    cycles, _ = recompute_cycles(user, Cycle.objects.filter(pk__in=list(current_cycle.values_list('pk', flat=True))))
+    return cycles[0] if cycles else None
@@ -0,0 +1,74 @@
+import django
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from .models import Workout, WorkoutExercise, WorkoutLog, Cycle, CyclePhase, CycleLog, CycleLogSymptom, SymptomRollup, IdempotencyKey
+
+User = get_user_model()
+
+# Rows removed per DELETE statement, so no single statement holds locks for long
+DELETE_BATCH_SIZE = 5000
+
+
+def _user_data(user_id):
+    """Querysets over a user's data, children before parents so each can be deleted without cascading"""
+    return [
+        CycleLogSymptom.objects.filter(cycle_log__cycle_phase__cycle__user_id=user_id),
+        CycleLog.objects.filter(cycle_phase__cycle__user_id=user_id),
+        CyclePhase.objects.filter(cycle__user_id=user_id),
+        Cycle.objects.filter(user_id=user_id),
+        SymptomRollup.objects.filter(user_id=user_id),
+        WorkoutLog.objects.filter(user_id=user_id),
+        WorkoutExercise.objects.filter(workout__user_id=user_id),
+        Workout.objects.filter(user_id=user_id),
+        IdempotencyKey.objects.filter(user_id=user_id),
+    ]
+
+
+# QuerySet._raw_delete() is private. It is only used on the Django releases it was checked against;
+# on others delete_without_signals() falls back to delete(), which is correct but slower.
+RAW_DELETE_CHECKED = (4, 2) <= django.VERSION[:2] <= (5, 2)
+
+
+def delete_without_signals(queryset, db):
+    """Delete the rows of a queryset with one DELETE statement, sending no delete signals"""
+    if RAW_DELETE_CHECKED:
+        return queryset._raw_delete(db)
+    return queryset.delete()[0]
+
+
+def _delete_in_batches(queryset, batch_size):
+    """Delete the rows of a queryset batch_size rows at a time"""
+    model = queryset.model
+    db = router.db_for_write(model)
+    queryset = queryset.using(db)
+    # Every dependent row has already been removed, so delete() cascades nowhere. The rollups the
+    # CycleLogSymptom signals would update one row at a time are deleted here too, so skip them.
+    send_signals = model is not CycleLogSymptom
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        batch = model.objects.using(db).filter(pk__in=ids)
+        with transaction.atomic(using=db):
+            deleted += batch.delete()[0] if send_signals else delete_without_signals(batch, db)
+
+
+def delete_account(user_id, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete a user and all their data in batches, in dependency order.
+
+    Cycle log symptoms go through delete_without_signals(), one DELETE per batch with no rows
+    loaded. The other models are deleted with QuerySet.delete(), so the collector loads each
+    batch of up to batch_size rows to send their signals; unlike user.delete(), that never
+    means all of a user's rows at once. If interrupted, calling it again carries on where it
+    stopped. Returns the number of rows deleted per model.
+    """
+    counts = {}
+    for queryset in _user_data(user_id):
+        counts[queryset.model.__name__] = _delete_in_batches(queryset, batch_size)
+
+    # What is left (tokens, admin log entries, permissions) is small enough for the collector
+    _, user_counts = User.objects.filter(pk=user_id).delete()
+    counts.update({label.split('.')[-1]: count for label, count in user_counts.items()})
+    return counts
@@ -0,0 +1,43 @@
+"""
+Human readable labels for model instances, loaded in bulk.
+
+Model __str__ methods only use relations that are already loaded and fall back to ids
+otherwise, so printing an object never queries. Models list the relations their label shows
+in `label_related`; the helpers here load those for many objects at once.
+"""
+
+from collections import defaultdict
+
+
+def with_labels(queryset):
+    """Select the related rows the queryset's model shows in its label"""
+    return queryset.select_related(*getattr(queryset.model, 'label_related', ()))
+
+
+def resolve_labels(objects):
+    """Return the labels of model instances in order, with one query per model that needs one"""
+    objects = list(objects)
+    by_model = defaultdict(list)
+    for obj in objects:
+        if getattr(type(obj), 'label_related', None) and obj.pk is not None:
+            by_model[type(obj)].append(obj.pk)
+
+    loaded = {}
+    for model, pks in by_model.items():
+        for pk, obj in with_labels(model._base_manager.all()).in_bulk(pks).items():
+            loaded[(model, pk)] = obj
+
+    return [str(loaded.get((type(obj), obj.pk), obj)) for obj in objects]
+
+
+class LazyLabels:
+    """
+    Log argument that resolves the labels of model instances only when the record is formatted,
+    so filtered out log calls never query, e.g. logger.debug("Deleting %s", LazyLabels(logs))
+    """
+
+    def __init__(self, objects):
+        self.objects = list(objects)
+
+    def __str__(self):
+        return ", ".join(resolve_labels(self.objects))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Run performance benchmarks against synthetic data; all data created is rolled back afterwards"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all). Available: {', '.join(sorted(BENCHMARKS))}")
+        parser.add_argument('--years', type=int, default=5, help="Years of synthetic history to generate")
+        parser.add_argument('--repeat', type=int, default=5, help="Number of timed repetitions")
+        parser.add_argument('--concurrency', type=int, default=8, help="Number of concurrent threads for load benchmarks")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per thread for load benchmarks")
+
+    def handle(self, *args, **options):
+        names = options['names'] or sorted(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            with transaction.atomic():
+                BENCHMARKS[name](self.stdout.write, options)
+                transaction.set_rollback(True)
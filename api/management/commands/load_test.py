@@ -0,0 +1,182 @@
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+from api.synthetic import create_synthetic_user
+
+LOAD_TEST_PATHS = ['/api/user/', '/api/workouts/', '/api/workout-logs/', '/api/cycle-data/', '/api/period-dates/', '/api/exercises/']
+
+
+def parse_config(spec):
+    """Turn `class[:workers[xthreads]]`, e.g. `gthread:2x8`, into gunicorn.conf.py environment overrides"""
+    kind, _, counts = spec.partition(':')
+    env = {'WEB_WORKER_CLASS': kind}
+    if counts:
+        workers, _, threads = counts.partition('x')
+        env['WEB_CONCURRENCY'] = workers
+        if threads:
+            env['GUNICORN_THREADS'] = threads
+    return env
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _process_tree(pid):
+    """Return `pid` and the pids of its child processes"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [pid, *map(int, f.read().split())]
+    except OSError:
+        return [pid]
+
+
+def _pss_bytes(pids):
+    """Proportional set size of processes: shared pages are split between the processes sharing them"""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('Pss:')) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Start gunicorn with each given configuration and compare throughput, latency and memory on a "
+        "synthetic user's data. Load is generated from this process, so run it on the machine being sized "
+        "and compare configurations with each other rather than with production numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'configs', nargs='*', default=['sync', 'gthread'],
+            help="Configurations as class[:workers[xthreads]], e.g. sync:3 gthread:2x8 uvicorn; counts left out are sized by gunicorn.conf.py",
+        )
+        parser.add_argument('--duration', type=float, default=10, help="Seconds of load per configuration")
+        parser.add_argument('--concurrency', type=int, default=16, help="Concurrent client connections")
+        parser.add_argument('--email', default='loadtest@example.com', help="Synthetic user to request as, created if missing")
+        parser.add_argument('--years', type=int, default=5, help="Years of history when creating the synthetic user")
+        parser.add_argument('--preload', action='store_true', help="Start workers with GUNICORN_PRELOAD")
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(email=options['email']).first()
+        if user is None:
+            self.stdout.write(f"Creating {options['email']} with {options['years']} years of history")
+            user = create_synthetic_user(options['email'], years=options['years'], seed=0)
+        headers = {'Authorization': f"Bearer {AccessToken.for_user(user)}", 'Accept-Encoding': 'br, gzip'}
+
+        self.stdout.write(f"{'config':<20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'processes':>10} {'PSS MiB':>8}")
+        for spec in options['configs']:
+            try:
+                result = self.run_config(spec, headers, options)
+            except CommandError as e:
+                self.stderr.write(f"{spec:<20} {e}")
+                continue
+            self.stdout.write(
+                f"{spec:<20} {result['throughput']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} "
+                f"{result['errors']:>7} {result['processes']:>10} {result['pss'] / (1024 * 1024):>8.1f}"
+            )
+
+    def run_config(self, spec, headers, options):
+        port = _free_port()
+        env = {
+            **os.environ,
+            **parse_config(spec),
+            'PORT': str(port),
+            'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+            'GUNICORN_PRELOAD': 'true' if options['preload'] else 'false',
+            # The load comes from one address and one user; keep the rate limits out of the measurement
+            'THROTTLE_RATE_USER': '1000000/min',
+            'THROTTLE_SHARED_MEMORY_PATH': os.path.join(tempfile.gettempdir(), f'cyclesync-load-test-{port}'),
+        }
+        # A file rather than a pipe: nobody reads the server's log while it runs, and a full pipe would block it
+        with tempfile.TemporaryFile(mode='w+') as log:
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py')],
+                env=env, cwd=settings.BASE_DIR, stdout=log, stderr=subprocess.STDOUT,
+            )
+            try:
+                self.wait_until_ready(server, port, headers, log)
+                latencies, errors, elapsed = self.generate_load(port, headers, options['duration'], options['concurrency'])
+                processes = _process_tree(server.pid)
+                pss = _pss_bytes(processes)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': percentiles[49],
+            'p95': percentiles[94],
+            'p99': percentiles[98],
+            'errors': errors,
+            'processes': len(processes),
+            'pss': pss,
+        }
+
+    def wait_until_ready(self, server, port, headers, log, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError(f"gunicorn exited: {log.read().strip().splitlines()[-1]}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                # One request per path so every worker has something cached before timing starts
+                for path in LOAD_TEST_PATHS:
+                    connection.request('GET', path, headers=headers)
+                    connection.getresponse().read()
+                connection.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"gunicorn did not answer on port {port} within {timeout} seconds")
+
+    def generate_load(self, port, headers, duration, concurrency):
+        """Request LOAD_TEST_PATHS round robin from `concurrency` threads, returning (latencies in ms, errors, seconds)"""
+        latencies, errors = [], []
+        deadline = time.monotonic() + duration
+
+        def client(offset):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            i = offset
+            while time.monotonic() < deadline:
+                path = LOAD_TEST_PATHS[i % len(LOAD_TEST_PATHS)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                # list.append is atomic, so the threads can share the lists
+                (latencies if ok else errors).append((time.perf_counter() - start) * 1000)
+            connection.close()
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, len(errors), time.monotonic() - start
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.startup import PHASES, import_time_by_package, measure_startup
+
+
+class Command(BaseCommand):
+    help = "Profile how long a fresh worker takes to import the project and serve its first request"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', help="Settings module the worker starts with (default: the current one)")
+        parser.add_argument('--path', default='/api/user/', help="Path of the requests to time")
+        parser.add_argument('--repeat', type=int, default=3, help="Number of workers to start; the fastest time of each phase is shown")
+        parser.add_argument('--top', type=int, default=15, help="Number of packages and modules in the import time breakdown")
+        parser.add_argument('--no-warm-up', action='store_true', help="Leave the URLconf and views to be loaded by the first request")
+
+    def handle(self, *args, **options):
+        measure = dict(settings_module=options['settings_module'], path=options['path'], warm_up=not options['no_warm_up'])
+        try:
+            runs = [measure_startup(**measure) for _ in range(options['repeat'])]
+            # Import timing slows imports down, so it gets a run of its own
+            imports = measure_startup(import_times=True, **measure)['imports']
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Startup phases (best of {len(runs)})"))
+        total = 0
+        for phase in PHASES:
+            millis = min(run['timings'][phase] for run in runs)
+            total += millis
+            self.stdout.write(f"  {phase:<30} {millis:>10.1f} ms")
+        self.stdout.write(f"  {'time to second response':<30} {total:>10.1f} ms")
+        self.stdout.write(f"  {runs[0]['modules']} modules loaded, {runs[0]['first_request_modules']} of them by the first request")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Import time by package (self)"))
+        for package, self_us in import_time_by_package(imports)[:options['top']]:
+            self.stdout.write(f"  {package:<30} {self_us / 1000:>10.1f} ms")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest imports (cumulative)"))
+        # Only modules imported by code outside any other import, i.e. what the startup path asks for
+        top_level = sorted((record for record in imports if record[3] == 0), key=lambda record: record[2], reverse=True)
+        for name, _, cumulative_us, _ in top_level[:options['top']]:
+            self.stdout.write(f"  {name:<50} {cumulative_us / 1000:>10.1f} ms")
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from api.analytics import rebuild_symptom_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the pre-aggregated symptom analytics from the cycle logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help="Only rebuild the rollups for the user with this email")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['email']:
+            try:
+                user = get_user_model().objects.get(email=options['email'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user found with email {options['email']}")
+
+        total = rebuild_symptom_rollups(user=user)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} symptom rollup rows"))
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api.tasks import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (account deletion, cycle recomputation, imports and exports)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of waiting for new jobs")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait before polling an empty queue again")
+        parser.add_argument('--max-jobs', type=int, default=0, help="Exit after running this many jobs (default: no limit)")
+
+    def handle(self, *args, **options):
+        processed = 0
+        last_reap = None
+        while not options['max_jobs'] or processed < options['max_jobs']:
+            close_old_connections()
+            # Jobs of a worker that died mid-job; once a minute is plenty at TASK_STALE_AFTER's scale
+            if last_reap is None or time.monotonic() - last_reap > 60:
+                requeue_stale_jobs()
+                last_reap = time.monotonic()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            job = run_job(job)
+            processed += 1
+            style = self.style.SUCCESS if job.status == job.SUCCEEDED else self.style.ERROR
+            self.stdout.write(style(f"{job.name} {job.pk}: {job.status}"))
+
+        self.stdout.write(f"Ran {processed} job(s)")
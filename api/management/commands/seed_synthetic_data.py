@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.synthetic import create_synthetic_user
+
+
+class Command(BaseCommand):
+    help = "Create synthetic users with years of cycle and workout history for local load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help="Number of users to create")
+        parser.add_argument('--years', type=int, default=5, help="Years of history per user")
+        parser.add_argument('--prefix', default='synthetic', help="Email prefix for the created users")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for repeatable data")
+
+    def handle(self, *args, **options):
+        for i in range(options['users']):
+            email = f"{options['prefix']}{i + 1}@example.com"
+            seed = None if options['seed'] is None else options['seed'] + i
+            create_synthetic_user(email, years=options['years'], seed=seed)
+            self.stdout.write(f"Created {email} with {options['years']} years of history")
+
+        self.stdout.write(self.style.SUCCESS(f"Created {options['users']} synthetic users"))
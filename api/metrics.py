@@ -0,0 +1,127 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds in milliseconds of the latency histogram buckets; the last bucket is unbounded
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+# Upper bounds of the query count histogram buckets: a handful is normal, dozens mean an N+1
+QUERY_COUNT_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100]
+
+# Metrics of the request being handled, set by RequestMetricsMiddleware for sampled requests only
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Timings and query counts collected while handling a single request"""
+    __slots__ = ('start', 'db_queries', 'db_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+class QueryTimer:
+    """Database execute wrapper adding each query's count and duration to the request metrics"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.metrics.db_queries += 1
+            self.metrics.db_time += time.perf_counter() - start
+
+
+@contextmanager
+def serializer_timer():
+    """Add the time spent in the block to the request's serializer time, counting nested blocks once"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        if metrics.serializer_depth == 0:
+            metrics.serializer_time += time.perf_counter() - start
+
+
+class Histogram:
+    """Fixed-bucket histogram, of millisecond values unless given other bucket bounds"""
+
+    def __init__(self, bounds=HISTOGRAM_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def snapshot(self):
+        count = sum(self.counts)
+        return {
+            "count": count,
+            "mean": self.total / count if count else 0,
+            "buckets": {
+                **{f"le_{bound}": bucket for bound, bucket in zip(self.bounds, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+class MetricsRegistry:
+    """Per-process aggregate of sampled request metrics, keyed by method and route"""
+    # Field -> bucket bounds of its histogram
+    FIELDS = {
+        'total': HISTOGRAM_BUCKETS,
+        'db': HISTOGRAM_BUCKETS,
+        'serializer': HISTOGRAM_BUCKETS,
+        'queries': QUERY_COUNT_BUCKETS,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, endpoint, metrics):
+        values = {
+            'total': metrics.elapsed() * 1000,
+            'db': metrics.db_time * 1000,
+            'serializer': metrics.serializer_time * 1000,
+            'queries': metrics.db_queries,
+        }
+        with self._lock:
+            histograms = self._histograms.setdefault(endpoint, {field: Histogram(bounds) for field, bounds in self.FIELDS.items()})
+            for field, value in values.items():
+                histograms[field].observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {field: histogram.snapshot() for field, histogram in histograms.items()}
+                for endpoint, histograms in self._histograms.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
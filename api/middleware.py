@@ -0,0 +1,116 @@
+import logging
+import random
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from .compression import compress, negotiate
+from .metrics import QueryTimer, RequestMetrics, current_metrics, registry
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, database time, serializer time and total latency for a sample of requests.
+
+    Sampled responses get a Server-Timing header, a structured log line on the `api.middleware`
+    logger, and are aggregated into the histograms served by the admin metrics endpoint.
+    With REQUEST_METRICS_SAMPLE_RATE set to 0 the middleware removes itself from the stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(QueryTimer(metrics)))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+
+        total = metrics.elapsed() * 1000
+        db_time = metrics.db_time * 1000
+        serializer_time = metrics.serializer_time * 1000
+        response['Server-Timing'] = (
+            f'db;dur={db_time:.1f};desc="{metrics.db_queries} queries", '
+            f'serializer;dur={serializer_time:.1f}, '
+            f'total;dur={total:.1f}'
+        )
+
+        route = request.resolver_match.route if request.resolver_match else 'unresolved'
+        registry.record(f"{request.method} {route}", metrics)
+
+        logger.info(
+            "%s %s %s %.1fms db=%d/%.1fms serializer=%.1fms",
+            request.method, request.path, response.status_code, total, metrics.db_queries, db_time, serializer_time,
+            extra={
+                "request_metrics": {
+                    "method": request.method,
+                    "route": route,
+                    "status": response.status_code,
+                    "total_ms": total,
+                    "db_queries": metrics.db_queries,
+                    "db_ms": db_time,
+                    "serializer_ms": serializer_time,
+                },
+            },
+        )
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compress API responses with the best encoding the client accepts (Brotli, zstd or gzip).
+
+    Only complete responses of at least COMPRESSION_MIN_SIZE bytes with a text, JSON or MessagePack
+    content type are compressed. Responses that already have a Content-Encoding (the pre-compressed
+    exercise catalogue, static files) are passed through untouched.
+    """
+
+    COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack', 'text/', 'application/javascript', 'application/xml')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < self.min_size
+            or not response.get('Content-Type', '').startswith(self.COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        # Caches must keep the variants apart even when this client gets the plain body
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The compressed body is no longer byte-identical to what a strong ETag promised
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_create_superuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SymptomRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle_day', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('phase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='symptom_rollups', to='api.phase')),
+                ('symptom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.symptom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='symptom_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'phase', 'symptom', 'cycle_day')},
+            },
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:12
+
+# Data only: the constraints are added by the next migration, in a transaction of their own,
+# so PostgreSQL has no trigger events from these updates and deletes pending when they are created
+
+from django.db import migrations
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Min
+
+
+def _merge_log(CycleLogSymptom, extra_log_id, keep_log_id):
+    """Move the symptoms of a duplicate log to the log that is kept, dropping ones it already has"""
+    kept_symptoms = set(CycleLogSymptom.objects.filter(cycle_log=keep_log_id).values_list('symptom', flat=True))
+    extra = CycleLogSymptom.objects.filter(cycle_log=extra_log_id)
+    extra.filter(symptom__in=kept_symptoms).delete()
+    extra.update(cycle_log=keep_log_id)
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Merge duplicate cycles and period logs created by concurrent requests so the unique
+    constraints of the next migration can be added. Logs of a duplicate cycle move to the matching phase of the cycle
+    that is kept (the whole phase moves when there is none); only logs for a date the kept phase
+    already has are merged into that log, keeping every symptom. Rollups of the users touched
+    are rebuilt afterwards.
+    """
+    Cycle = apps.get_model('api', 'Cycle')
+    CyclePhase = apps.get_model('api', 'CyclePhase')
+    CycleLog = apps.get_model('api', 'CycleLog')
+    CycleLogSymptom = apps.get_model('api', 'CycleLogSymptom')
+    users = set()
+
+    duplicate_cycles = Cycle.objects.values('user', 'start_date').annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicate_cycles:
+        users.add(duplicate['user'])
+        kept_phases = {cycle_phase.phase_id: cycle_phase for cycle_phase in CyclePhase.objects.filter(cycle=duplicate['keep'])}
+        extra_cycles = Cycle.objects.filter(user=duplicate['user'], start_date=duplicate['start_date']).exclude(id=duplicate['keep'])
+        for cycle_phase in CyclePhase.objects.filter(cycle__in=extra_cycles):
+            kept_phase = kept_phases.get(cycle_phase.phase_id)
+            if kept_phase is None:
+                cycle_phase.cycle_id = duplicate['keep']
+                cycle_phase.save(update_fields=['cycle'])
+                kept_phases[cycle_phase.phase_id] = cycle_phase
+                continue
+            kept_logs = dict(CycleLog.objects.filter(cycle_phase=kept_phase).values_list('date', 'id'))
+            for log in CycleLog.objects.filter(cycle_phase=cycle_phase):
+                if log.date in kept_logs:
+                    _merge_log(CycleLogSymptom, log.id, kept_logs[log.date])
+                    log.delete()
+                else:
+                    log.cycle_phase_id = kept_phase.id
+                    log.save(update_fields=['cycle_phase'])
+                    kept_logs[log.date] = log.id
+        # Only empty phases are left to cascade
+        extra_cycles.delete()
+
+    duplicate_logs = CycleLog.objects.values('cycle_phase', 'date').annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicate_logs:
+        extra_logs = CycleLog.objects.filter(cycle_phase=duplicate['cycle_phase'], date=duplicate['date']).exclude(id=duplicate['keep'])
+        users.update(extra_logs.values_list('cycle_phase__cycle__user', flat=True))
+        for extra_log_id in extra_logs.values_list('id', flat=True):
+            _merge_log(CycleLogSymptom, extra_log_id, duplicate['keep'])
+        extra_logs.delete()
+
+    # Historical models send no signals, so the rollups did not follow the merge
+    if users:
+        _rebuild_symptom_rollups(apps, users)
+
+
+def _rebuild_symptom_rollups(apps, users):
+    """Recount the symptom rollups of the given users from their cycle logs"""
+    SymptomRollup = apps.get_model('api', 'SymptomRollup')
+    CycleLogSymptom = apps.get_model('api', 'CycleLogSymptom')
+
+    counts = CycleLogSymptom.objects.filter(cycle_log__cycle_phase__cycle__user__in=users).annotate(
+        day_offset=ExpressionWrapper(
+            F('cycle_log__date') - F('cycle_log__cycle_phase__cycle__start_date'),
+            output_field=DurationField(),
+        ),
+    ).values(
+        'cycle_log__cycle_phase__cycle__user_id',
+        'cycle_log__cycle_phase__phase_id',
+        'symptom_id',
+        'day_offset',
+    ).annotate(total=Count('id')).order_by()
+
+    SymptomRollup.objects.filter(user__in=users).delete()
+    SymptomRollup.objects.bulk_create([
+        SymptomRollup(
+            user_id=row['cycle_log__cycle_phase__cycle__user_id'],
+            phase_id=row['cycle_log__cycle_phase__phase_id'],
+            symptom_id=row['symptom_id'],
+            cycle_day=row['day_offset'].days + 1,
+            count=row['total'],
+        )
+        for row in counts
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_workouttemplate'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_case_duplicates(apps, schema_editor):
+    """
+    Stop before adding the constraint if emails differ only by case. Which account to keep, and
+    what to do with the other's data, is for a person to decide, so nothing is merged here.
+    """
+    CustomUser = apps.get_model('api', 'CustomUser')
+    duplicates = (
+        CustomUser.objects.annotate(email_lower=Lower('email')).values('email_lower')
+        .annotate(total=Count('id')).filter(total__gt=1).values_list('email_lower', flat=True)
+    )
+    if duplicates:
+        users = CustomUser.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=list(duplicates)).order_by('email_lower', 'id')
+        listing = "\n".join(f"  id {user.id}: {user.email} (joined {user.date_joined:%Y-%m-%d})" for user in users)
+        raise RuntimeError(
+            "These accounts have emails that differ only by case, which the unique_user_email_lower "
+            "constraint does not allow. Merge or rename them, then run the migration again:\n" + listing
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_job'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='unique_user_email_lower'),
+        ),
+    ]
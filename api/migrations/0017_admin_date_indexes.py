@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_unique_user_email_lower'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cycle',
+            index=models.Index(fields=['start_date'], name='cycle_start_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cyclelog',
+            index=models.Index(fields=['date'], name='cyclelog_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cyclephase',
+            index=models.Index(fields=['start_date'], name='cyclephase_start_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['created_at'], name='workout_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', 'id'], name='workout_user_id_idx'),
+        ),
+    ]
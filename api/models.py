@@ -1,5 +1,35 @@
+import uuid
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+
+
+def _loaded(instance, path):
+    """
+    Follow foreign keys along a `__` separated path without querying, returning None as soon
+    as one of them has not been loaded (see api/labels.py for loading them in bulk).
+    """
+    for name in path.split('__'):
+        if instance is None:
+            return None
+        instance = instance._meta.get_field(name).get_cached_value(instance, default=None)
+    return instance
+
+
+def _phase_label(cycle_phase):
+    """e.g. "Luteal phase", or the phase id when the phase has not been loaded"""
+    if cycle_phase.phase_id is None:
+        return "No Phase phase"
+    phase = _loaded(cycle_phase, 'phase')
+    return f"{phase.name} phase" if phase else f"Phase {cycle_phase.phase_id}"
+
+
+def _owner_label(cycle_phase):
+    """Email of the user owning a cycle phase, or the cycle id when the user has not been loaded"""
+    user = _loaded(cycle_phase, 'cycle__user')
+    return user.email if user else f"cycle {cycle_phase.cycle_id}"
 
 
 class CustomUserManager(BaseUserManager):
@@ -26,6 +56,23 @@ class CustomUserManager(BaseUserManager):
             raise ValueError("Superuser must have is_superuser=True.")
 
         return self.create_user(email, password, **extra_fields)
+
+    def register(self, email, password, name=None):
+        """
+        Create a user with a single INSERT, raising IntegrityError if the email is already taken.
+
+        The insert runs in a savepoint so a duplicate does not break an enclosing transaction.
+        """
+        if not email:
+            raise ValueError("Email is required")
+        user = self.model(email=self.normalize_email(email), name=name, password=make_password(password))
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
+        return user
+
+    def get_by_natural_key(self, username):
+        """Look users up by email ignoring case, using the index on lower(email)"""
+        return self.alias(email_lower=Lower('email')).get(email_lower=Lower(Value(username)))
     
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
@@ -57,6 +104,11 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='unique_user_email_lower'),
+        ]
+
     def __str__(self):
         return self.email
     
@@ -78,14 +130,58 @@ class Exercise(models.Model):
         return self.name
 
 
+class WorkoutTemplate(models.Model):
+    """Model to represent a shared workout that users can reference instead of copying"""
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class WorkoutTemplateExercise(models.Model):
+    """Model to represent an exercise within a shared workout template"""
+    template = models.ForeignKey(WorkoutTemplate, on_delete=models.CASCADE, related_name='template_exercises')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    sets = models.PositiveIntegerField()
+    reps = models.PositiveIntegerField()
+    weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # Weight in kg or lbs
+
+    # Relations __str__ shows when they are already loaded
+    label_related = ('exercise', 'template')
+
+    def __str__(self):
+        exercise = _loaded(self, 'exercise')
+        template = _loaded(self, 'template')
+        return f"{exercise.name if exercise else f'Exercise {self.exercise_id}'} in template {template.name if template else self.template_id}"
+
+
 class Workout(models.Model):
     """Model to represent a workout created by a user"""
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='workouts')
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Workouts created from a template share its exercises until the user modifies them
+    template = models.ForeignKey(WorkoutTemplate, on_delete=models.PROTECT, related_name='workouts', null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='workout_created_at_idx'),  # Admin date hierarchy
+            models.Index(fields=['user', 'id'], name='workout_user_id_idx'),  # Keyset pages of a user's workouts
+        ]
+
+    # Relations __str__ shows when they are already loaded
+    label_related = ('user',)
 
     def __str__(self):  
-        return f"{self.name} by {self.user.email}"
+        user = _loaded(self, 'user')
+        return f"{self.name} by {user.email if user else f'user {self.user_id}'}"
+
+    def get_exercises(self):
+        """Return the exercises of this workout, from its template if it still shares one"""
+        if self.template_id:
+            return self.template.template_exercises.all()
+        return self.workout_exercises.all()
 
 
 class WorkoutExercise(models.Model):
@@ -96,8 +192,13 @@ class WorkoutExercise(models.Model):
     reps = models.PositiveIntegerField()
     weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # Weight in kg or lbs
 
+    # Relations __str__ shows when they are already loaded
+    label_related = ('exercise', 'workout')
+
     def __str__(self):
-        return f"{self.exercise.name} in {self.workout.name}"
+        exercise = _loaded(self, 'exercise')
+        workout = _loaded(self, 'workout')
+        return f"{exercise.name if exercise else f'Exercise {self.exercise_id}'} in {workout.name if workout else f'workout {self.workout_id}'}"
     
 
 class WorkoutLog(models.Model):
@@ -109,8 +210,13 @@ class WorkoutLog(models.Model):
     class Meta:
         unique_together = ('user', 'date')  # Ensure a user can only log one workout per day
 
+    # Relations __str__ shows when they are already loaded
+    label_related = ('workout', 'user')
+
     def __str__(self):
-        return f"Workout {self.workout.name} logged for {self.date} by {self.user.email}"
+        workout = _loaded(self, 'workout')
+        user = _loaded(self, 'user')
+        return f"Workout {workout.name if workout else self.workout_id} logged for {self.date} by {user.email if user else f'user {self.user_id}'}"
     
 
 class Cycle(models.Model):
@@ -119,8 +225,20 @@ class Cycle(models.Model):
     start_date = models.DateField()
     cycle_length = models.PositiveIntegerField(default=28)  # Length of the cycle in days
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'start_date'], name='unique_cycle_start_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['start_date'], name='cycle_start_date_idx'),  # Admin date hierarchy
+        ]
+
+    # Relations __str__ shows when they are already loaded
+    label_related = ('user',)
+
     def __str__(self): 
-        return f"Cycle for {self.user.email} from {self.start_date} for {self.cycle_length} days"
+        user = _loaded(self, 'user')
+        return f"Cycle for {user.email if user else f'user {self.user_id}'} from {self.start_date} for {self.cycle_length} days"
     
 
 class Phase(models.Model):
@@ -138,8 +256,16 @@ class CyclePhase(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date'], name='cyclephase_start_date_idx'),  # Admin date hierarchy
+        ]
+
+    # Relations __str__ shows when they are already loaded
+    label_related = ('phase', 'cycle__user')
+
     def __str__(self):
-        return f"{self.phase.name if self.phase else 'No Phase'} phase for {self.cycle.user.email} from {self.start_date} to {self.end_date}"
+        return f"{_phase_label(self)} for {_owner_label(self)} from {self.start_date} to {self.end_date}"
 
 
 class Symptom(models.Model):
@@ -156,8 +282,22 @@ class CycleLog(models.Model):
     date = models.DateField()
     symptoms = models.ManyToManyField(Symptom, blank=True, related_name='cycle_logs', through='CycleLogSymptom')  # Symptoms experienced
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cycle_phase', 'date'], name='unique_cycle_log_per_phase_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='cyclelog_date_idx'),  # Admin date hierarchy
+        ]
+
+    # Relations __str__ shows when they are already loaded
+    label_related = ('cycle_phase__phase', 'cycle_phase__cycle__user')
+
     def __str__(self):
-        return f"Log for {self.cycle_phase.phase.name} phase on {self.date} for {self.cycle_phase.cycle.user.email}"
+        cycle_phase = _loaded(self, 'cycle_phase')
+        if not cycle_phase:
+            return f"Log for cycle phase {self.cycle_phase_id} on {self.date}"
+        return f"Log for {_phase_label(cycle_phase)} on {self.date} for {_owner_label(cycle_phase)}"
     
 
 class CycleLogSymptom(models.Model):
@@ -165,6 +305,79 @@ class CycleLogSymptom(models.Model):
     cycle_log = models.ForeignKey(CycleLog, on_delete=models.CASCADE, related_name='cycle_log_symptoms')
     symptom = models.ForeignKey(Symptom, on_delete=models.CASCADE, related_name='cycle_log_symptoms')
 
+    # Relations __str__ shows when they are already loaded
+    label_related = ('symptom', 'cycle_log__cycle_phase__phase')
+
+    def __str__(self):
+        symptom = _loaded(self, 'symptom')
+        cycle_log = _loaded(self, 'cycle_log')
+        cycle_phase = _loaded(cycle_log, 'cycle_phase')
+        symptom_name = symptom.symptom_name if symptom else f"Symptom {self.symptom_id}"
+        if not cycle_phase:
+            return f"{symptom_name} in log {self.cycle_log_id}"
+        return f"{symptom_name} in log for {_phase_label(cycle_phase)} on {cycle_log.date}"
+
+
+class SymptomRollup(models.Model):
+    """Model to store pre-aggregated symptom counts per user, phase and cycle day"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='symptom_rollups')
+    phase = models.ForeignKey(Phase, on_delete=models.CASCADE, related_name='symptom_rollups', null=True, blank=True)
+    symptom = models.ForeignKey(Symptom, on_delete=models.CASCADE, related_name='rollups')
+    cycle_day = models.PositiveIntegerField()  # Day of the cycle the symptom was logged on, starting at 1
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'phase', 'symptom', 'cycle_day')
+
+    def __str__(self):
+        return f"Symptom {self.symptom_id} on cycle day {self.cycle_day} for user {self.user_id}: {self.count}"
+
+
+class IdempotencyKey(models.Model):
+    """Model to store the response to a request sent with an Idempotency-Key header, so retries replay it"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"Idempotency key {self.key} for user {self.user_id}"
+
+
+class Job(models.Model):
+    """Model to represent a background job and its outcome"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Kept after the user is deleted so an account deletion job can still be polled
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, related_name='jobs', null=True, blank=True)
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_queue_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.symptom.symptom_name} in log for {self.cycle_log.cycle_phase.phase_name} phase on {self.cycle_log.date}"
-    
\ No newline at end of file
+        return f"Job {self.name} ({self.status})"
@@ -0,0 +1,80 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class ExerciseSearchPagination(PageNumberPagination):
+    """Page number pagination for exercise search results"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination for list endpoints. Each page is a range scan on the ordering key, e.g.
+    `date > <last date seen>`, so a page costs the same however much history the user has.
+
+    Pages are opt-in so existing clients keep working: requests without `cursor` or `page_size`
+    get the whole list in the endpoint's original shape. The ordering key should be indexed
+    together with the user, e.g. WorkoutLog's unique (user, date).
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
+        self.page = None
+
+    def is_requested(self, request):
+        """Whether the client asked for a page rather than the whole list"""
+        return self.cursor_query_param in request.query_params or self.page_size_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_list_response(self, data, key=None):
+        """
+        Respond with a page as `{"next", "previous", <key>}` (key defaults to "results"), or when no
+        page was requested with the whole list as before: `data` itself, or `{<key>: data}`
+        """
+        if self.page is None:
+            return Response({key: data} if key else data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            key or 'results': data,
+        })
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that takes the row count of unfiltered PostgreSQL tables from the planner's
+    statistics instead of running COUNT(*) over the whole table.
+
+    Counts are exact for filtered lists, other databases and tables below ESTIMATE_THRESHOLD rows.
+    """
+
+    ESTIMATE_THRESHOLD = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+                    row = cursor.fetchone()
+                # reltuples is -1 for tables that have never been analyzed
+                if row and row[0] >= self.ESTIMATE_THRESHOLD:
+                    return int(row[0])
+        return super().count
@@ -0,0 +1,103 @@
+"""
+MessagePack request and response bodies for clients that send `Accept: application/msgpack`
+(or `?format=msgpack`) and `Content-Type: application/msgpack`.
+
+On top of plain MessagePack, three extension types make the date-heavy lists compact:
+
+    1  a date: the number of days since 1970-01-01, as a big-endian signed 32 bit integer
+    2  a list of dates: their day numbers as consecutive big-endian signed 32 bit integers
+    3  a list of objects that all have the same keys: a MessagePack array holding the array of
+       keys followed by one array of values per key, so each key is sent once
+
+Everything else is encoded as the JSON renderer would encode it.
+"""
+
+import datetime
+import struct
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+EXT_DATE = 1
+EXT_DATE_LIST = 2
+EXT_COLUMNS = 3
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+_json_encoder = JSONEncoder()
+
+
+def _is_date(value):
+    # datetime is a subclass of date, but is sent as a string like the JSON renderer sends it
+    return isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)
+
+
+def _encode(value):
+    """Replace dates, date lists and lists of same-keyed objects with their extension types"""
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(_is_date(item) for item in value):
+            days = [item.toordinal() - EPOCH_ORDINAL for item in value]
+            return msgpack.ExtType(EXT_DATE_LIST, struct.pack(f'>{len(days)}i', *days))
+        if len(value) > 1 and isinstance(value[0], dict):
+            keys = value[0].keys()
+            if all(isinstance(item, dict) and item.keys() == keys for item in value):
+                columns = [_encode([item[key] for item in value]) for key in keys]
+                return msgpack.ExtType(EXT_COLUMNS, msgpack.packb([list(keys), *columns], default=_default))
+        # Columns of plain values, the common case, need no walk
+        if not any(isinstance(item, (dict, list, tuple, datetime.date)) for item in value):
+            return value
+        return [_encode(item) for item in value]
+    if _is_date(value):
+        return msgpack.ExtType(EXT_DATE, struct.pack('>i', value.toordinal() - EPOCH_ORDINAL))
+    return value
+
+
+def _default(value):
+    """Types MessagePack has no encoding for (datetimes, decimals, UUIDs, ...) are sent as in JSON"""
+    return _encode(_json_encoder.default(value))
+
+
+def _ext_hook(code, data):
+    if code == EXT_DATE:
+        return datetime.date.fromordinal(EPOCH_ORDINAL + struct.unpack('>i', data)[0])
+    if code == EXT_DATE_LIST:
+        return [datetime.date.fromordinal(EPOCH_ORDINAL + day) for day in struct.unpack(f'>{len(data) // 4}i', data)]
+    if code == EXT_COLUMNS:
+        keys, *columns = msgpack.unpackb(data, ext_hook=_ext_hook)
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+    return msgpack.ExtType(code, data)
+
+
+def packb(data):
+    return msgpack.packb(_encode(data), default=_default)
+
+
+def unpackb(body):
+    return msgpack.unpackb(body, ext_hook=_ext_hook)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(data)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return unpackb(stream.read())
+        except (ValueError, TypeError, struct.error) as e:
+            raise ParseError(f"MessagePack parse error - {e}")
+
@@ -0,0 +1,127 @@
+import bisect
+import threading
+from collections import Counter
+from .caching import get_catalogue_version
+
+# Minimum share of the query's trigrams a name must contain to be returned as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _trigrams(text):
+    """Return the set of trigrams of the words of a normalized string, padded so short words still match"""
+    trigrams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+class ExerciseIndex:
+    """In-memory prefix and trigram index over the exercise catalogue"""
+
+    def __init__(self, exercises):
+        # exercises: iterable of (id, name, exercise_type_id, exercise_type_name)
+        self.entries = sorted(exercises, key=lambda entry: _normalize(entry[1]))
+        self.names = [_normalize(entry[1]) for entry in self.entries]
+        self.name_trigrams = [_trigrams(name) for name in self.names]
+
+        # Sorted (word, position) pairs so every word of a name can be prefix searched with bisect
+        self.words = sorted(
+            (word, position)
+            for position, name in enumerate(self.names)
+            for word in name.split()
+        )
+
+        self.trigram_postings = {}
+        for position, trigrams in enumerate(self.name_trigrams):
+            for trigram in trigrams:
+                self.trigram_postings.setdefault(trigram, []).append(position)
+
+        self.type_ids = {}
+        self.type_names = {}
+        for position, (_, _, type_id, type_name) in enumerate(self.entries):
+            self.type_ids.setdefault(type_id, set()).add(position)
+            self.type_names.setdefault(type_name.lower(), set()).add(position)
+
+    @classmethod
+    def from_database(cls):
+        from .models import Exercise
+
+        exercises = Exercise.objects.values_list('id', 'name', 'exercise_type_id', 'exercise_type__name')
+        return cls(exercises)
+
+    def _prefix_matches(self, query):
+        """Positions of names with a word starting with the query"""
+        matches = set()
+        index = bisect.bisect_left(self.words, (query,))
+        while index < len(self.words) and self.words[index][0].startswith(query):
+            matches.add(self.words[index][1])
+            index += 1
+        return matches
+
+    def _fuzzy_matches(self, query):
+        """Share of the query's trigrams found in every name sharing at least one of them"""
+        query_trigrams = _trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.trigram_postings.get(trigram, ()))
+
+        return {position: count / len(query_trigrams) for position, count in shared.items()}
+
+    def _type_positions(self, exercise_type):
+        """Positions of exercises of a type given by id or case-insensitive name"""
+        if isinstance(exercise_type, int):
+            return self.type_ids.get(exercise_type, set())
+        return self.type_names.get(exercise_type.lower(), set())
+
+    def search(self, query="", exercise_type=None):
+        """Return matching (id, name, exercise_type_id, exercise_type_name) entries, best matches first"""
+        query = _normalize(query)
+
+        if not query:
+            if exercise_type is None:
+                return list(self.entries)
+            return [self.entries[position] for position in sorted(self._type_positions(exercise_type))]
+
+        # Names are sorted, so names starting with the query form one contiguous run
+        name_start = bisect.bisect_left(self.names, query)
+        name_end = name_start
+        while name_end < len(self.names) and self.names[name_end].startswith(query):
+            name_end += 1
+        name_prefix = set(range(name_start, name_end))
+
+        word_prefix = self._prefix_matches(query) - name_prefix
+        similarity = self._fuzzy_matches(query)
+        fuzzy = {position for position, score in similarity.items() if score >= FUZZY_THRESHOLD} - name_prefix - word_prefix
+
+        if exercise_type is not None:
+            positions = self._type_positions(exercise_type)
+            name_prefix &= positions
+            word_prefix &= positions
+            fuzzy &= positions
+
+        # Whole-name prefix matches first, then word prefix matches, both alphabetically, then fuzzy matches by similarity
+        ranked = sorted(name_prefix) + sorted(word_prefix) + sorted(fuzzy, key=lambda position: (-similarity[position], position))
+        return [self.entries[position] for position in ranked]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_exercise_index():
+    """Return the process-wide exercise index, rebuilding it when the catalogue version changes"""
+    global _index, _index_version
+
+    version = get_catalogue_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                _index = ExerciseIndex.from_database()
+                _index_version = version
+    return _index
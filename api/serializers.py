@@ -1,7 +1,138 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Workout, WorkoutExercise, Exercise, ExerciseType, WorkoutLog, Phase, Cycle, CyclePhase, CycleLog, CycleLogSymptom, Symptom
+from .models import Workout, WorkoutExercise, WorkoutTemplate, WorkoutTemplateExercise, Exercise, ExerciseType, WorkoutLog, Phase, Cycle, CyclePhase, CycleLog, CycleLogSymptom, Symptom
+from .caching import get_template_payload, get_template_payloads
+from .metrics import serializer_timer
+from .shaping import trim_data
+
+
+def _column_path(model, source):
+    """Return the ORM path of a field source made of foreign keys ending in a column, e.g. `workout.name` -> `workout__name`, else None"""
+    if source == '*':
+        return None
+    parts = source.split('.')
+    for i, part in enumerate(parts):
+        try:
+            model_field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if i < len(parts) - 1:
+            if not model_field.is_relation:
+                return None
+            model = model_field.related_model
+    return '__'.join(parts)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer recording the time spent building `.data` in the request metrics"""
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """
+    Base model serializer recording the time spent building `.data` in the request metrics.
+
+    Accepts `fields` and `expand` selections (see api/shaping.py). Meta may declare
+    `expandable`, field name -> serializer embedded instead of the related id when expanded,
+    and `field_loads`, field name -> {'only': columns, 'prefetch': lookups} for fields whose
+    source does not say what they read, such as method fields.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selected_fields = fields
+        self.expanded = expand or {}
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name, serializer_class in getattr(self.Meta, 'expandable', {}).items():
+            if name in self.expanded:
+                fields[name] = serializer_class(read_only=True)
+
+        # Hand each nested serializer its part of the selection
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, TimedModelSerializer):
+                nested.selected_fields = (self.selected_fields or {}).get(name) or None
+                nested.expanded = self.expanded.get(name, {})
+
+        if self.selected_fields:
+            fields = {name: field for name, field in fields.items() if name in self.selected_fields}
+        return fields
+
+    @classmethod
+    def shape_queryset(cls, queryset, fields=None, expand=None, required=()):
+        """
+        Load what the selected fields read and nothing else: relations that are not selected are
+        not joined or prefetched, and when every field maps to model columns the rest are
+        deferred with only(). `required` names further columns to load, e.g. a pagination key.
+        """
+        columns, related, prefetch = cls(fields=fields, expand=expand)._loads('')
+        if related:
+            queryset = queryset.select_related(*related)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if columns is not None:
+            queryset = queryset.only(*columns, *required)
+        return queryset
+
+    def _loads(self, prefix):
+        """Return (columns, or None if some field reads more than columns, select_related paths, prefetch lookups)"""
+        model = self.Meta.model
+        field_loads = getattr(self.Meta, 'field_loads', {})
+        columns, related, prefetch = [prefix + model._meta.pk.name], [], []
+        exact = True
+
+        for name, field in self.fields.items():
+            if name in field_loads:
+                columns += [prefix + column for column in field_loads[name].get('only', ())]
+                prefetch += [prefix + lookup for lookup in field_loads[name].get('prefetch', ())]
+            elif isinstance(field, TimedModelSerializer):
+                # A single related object, e.g. an exercise's type: join it and load its selected fields
+                path = prefix + field.source.replace('.', '__')
+                nested_columns, nested_related, nested_prefetch = field._loads(path + '__')
+                exact = exact and nested_columns is not None
+                columns += [path, *(nested_columns or ())]
+                related += [path, *nested_related]
+                prefetch += nested_prefetch
+            else:
+                path = _column_path(model, field.source)
+                if path is None:
+                    exact = False
+                    continue
+                # Following a foreign key, e.g. `workout.name`, joins it and loads the key too
+                hops = path.split('__')
+                related += [prefix + '__'.join(hops[:i]) for i in range(1, len(hops))]
+                columns += [prefix + '__'.join(hops[:i]) for i in range(1, len(hops) + 1)]
+
+        return (columns if exact else None), related, prefetch
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {}
+        for key in serializers.LIST_SERIALIZER_KWARGS_REMOVE:
+            value = kwargs.pop(key, None)
+            if value is not None:
+                list_kwargs[key] = value
+        list_kwargs['child'] = cls(*args, **kwargs)
+        list_kwargs.update({key: value for key, value in kwargs.items() if key in serializers.LIST_SERIALIZER_KWARGS})
+        list_serializer_class = getattr(cls.Meta, 'list_serializer_class', TimedListSerializer)
+        return list_serializer_class(*args, **list_kwargs)
+
 
 # Custom user serializer for signup
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -36,14 +167,14 @@ class TokenObtainPairSerializer(serializers.Serializer):
             raise serializers.ValidationError("Invalid credentials")
         
 
-class ExerciseTypeSerializer(serializers.ModelSerializer):
+class ExerciseTypeSerializer(TimedModelSerializer):
     """Serializer for ExerciseType model"""
     class Meta:
         model = ExerciseType
         fields = ['id', 'name']
 
 
-class ExerciseSerializer(serializers.ModelSerializer):
+class ExerciseSerializer(TimedModelSerializer):
     """Serializer for Exercise model"""
     exercise_type = ExerciseTypeSerializer()
 
@@ -52,7 +183,7 @@ class ExerciseSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'exercise_type']
 
 
-class WorkoutExerciseSerializer(serializers.ModelSerializer):
+class WorkoutExerciseSerializer(TimedModelSerializer):
     exercise = ExerciseSerializer(read_only=True)
 
     class Meta:
@@ -60,30 +191,78 @@ class WorkoutExerciseSerializer(serializers.ModelSerializer):
         fields = ['id', 'exercise', 'reps', 'sets', 'weight']
 
     
-class WorkoutSerializer(serializers.ModelSerializer):
-    workout_exercises = WorkoutExerciseSerializer(many=True, read_only=True)
+class WorkoutTemplateExerciseSerializer(TimedModelSerializer):
+    exercise = ExerciseSerializer(read_only=True)
+
+    class Meta:
+        model = WorkoutTemplateExercise
+        fields = ['id', 'exercise', 'reps', 'sets', 'weight']
+
+
+class WorkoutTemplateSerializer(TimedModelSerializer):
+    """Serializer for shared WorkoutTemplate model"""
+    workout_exercises = WorkoutTemplateExerciseSerializer(source='template_exercises', many=True, read_only=True)
+
+    class Meta:
+        model = WorkoutTemplate
+        fields = ['id', 'name', 'workout_exercises']
+
+
+class WorkoutListSerializer(TimedListSerializer):
+    """Fetches the cached payloads of every template in the list with one cache round trip"""
+
+    def to_representation(self, data):
+        workouts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'workout_exercises' in self.child.fields:
+            template_ids = list(dict.fromkeys(workout.template_id for workout in workouts if workout.template_id))
+            self.child.template_payloads = {payload['id']: payload for payload in get_template_payloads(template_ids)}
+        return super().to_representation(workouts)
+
+    
+class WorkoutSerializer(TimedModelSerializer):
+    workout_exercises = serializers.SerializerMethodField()
 
     class Meta:
         model = Workout
-        fields = ['id', 'name', 'created_at', 'workout_exercises']
+        fields = ['id', 'name', 'created_at', 'template', 'workout_exercises']
+        list_serializer_class = WorkoutListSerializer
+        field_loads = {
+            'workout_exercises': {'only': ('template',), 'prefetch': ('workout_exercises__exercise__exercise_type',)},
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Template payloads fetched up front by WorkoutListSerializer, by template id
+        self.template_payloads = {}
+
+    def get_workout_exercises(self, obj):
+        selection = (self.selected_fields or {}).get('workout_exercises') or None
+        # Workouts still sharing a template reuse its cached payload
+        if obj.template_id:
+            payload = self.template_payloads.get(obj.template_id) or get_template_payload(obj.template_id)
+            return trim_data(payload['workout_exercises'], selection)
+        return WorkoutExerciseSerializer(obj.workout_exercises.all(), many=True, fields=selection).data
 
 
-class WorkoutLogSerializer(serializers.ModelSerializer):
+class WorkoutLogSerializer(TimedModelSerializer):
     workout_name = serializers.CharField(source='workout.name', read_only=True)
+    # Left a date for the renderer: JSON still gets an ISO string, MessagePack a day number
+    date = serializers.DateField(format=None)
 
     class Meta:
         model = WorkoutLog
         fields = ['id', 'workout', 'workout_name', 'date']
+        expandable = {'workout': WorkoutSerializer}
 
 
-class CycleSerializer(serializers.ModelSerializer):
+class CycleSerializer(TimedModelSerializer):
     """Serializer for Cycle model"""
     class Meta:
         model = Cycle
         fields = ['id', 'start_date', 'cycle_length']
 
 
-class CyclePhaseSerializer(serializers.ModelSerializer):
+class CyclePhaseSerializer(TimedModelSerializer):
     """Serializer for CyclePhase model"""
     phase_name = serializers.CharField(source='phase.name', read_only=True)
 
@@ -92,7 +271,7 @@ class CyclePhaseSerializer(serializers.ModelSerializer):
         fields = ['id', 'phase_name', 'start_date', 'end_date']
 
 
-class CycleLogSerializer(serializers.ModelSerializer):
+class CycleLogSerializer(TimedModelSerializer):
     """Serializer for CycleLog model"""
     cycle_phase = CyclePhaseSerializer(many=True, read_only=True)
     symptoms = serializers.StringRelatedField(many=True)
@@ -0,0 +1,39 @@
+"""
+Sparse fieldsets for API responses.
+
+`?fields=id,name` limits a response to the named fields; dotted names pick fields of nested
+objects, e.g. `?fields=name,workout_exercises.exercise.name`. `?expand=workout` embeds a related
+object that is otherwise sent as its id. Responses are unchanged without either parameter.
+
+Serializers apply the selection (see TimedModelSerializer) and shape their queryset so only the
+columns and relations the selected fields read are loaded.
+"""
+
+
+def parse_paths(value):
+    """Turn "a,b.c,b.d" into {'a': {}, 'b': {'c': {}, 'd': {}}}; an empty dict selects everything below it"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def shape_from_request(request):
+    """Return the `fields` and `expand` selections of a request as serializer keyword arguments"""
+    return {
+        # None rather than {} when nothing was asked for, meaning every field
+        'fields': parse_paths(request.query_params.get('fields', '')) or None,
+        'expand': parse_paths(request.query_params.get('expand', '')),
+    }
+
+
+def trim_data(data, fields):
+    """Apply a field selection to already serialized data, e.g. a cached payload"""
+    if not fields or not isinstance(data, (list, dict)):
+        return data
+    if isinstance(data, list):
+        return [trim_data(item, fields) for item in data]
+    return {name: trim_data(value, fields[name]) for name, value in data.items() if name in fields}
@@ -0,0 +1,53 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .analytics import record_symptom, unrecord_symptom
+from .caching import bump_catalogue_version, invalidate_template_payload
+from .models import CycleLogSymptom, Exercise, ExerciseType, WorkoutTemplate, WorkoutTemplateExercise
+
+
+@receiver(post_save, sender=CycleLogSymptom)
+def cycle_log_symptom_saved(sender, instance, created, **kwargs):
+    """Keep the symptom rollups up to date when a symptom is logged"""
+    if created:
+        record_symptom(instance)
+
+
+@receiver(post_delete, sender=CycleLogSymptom)
+def cycle_log_symptom_deleted(sender, instance, **kwargs):
+    """Keep the symptom rollups up to date when a logged symptom is removed"""
+    unrecord_symptom(instance)
+
+
+@receiver([post_save, post_delete], sender=WorkoutTemplate)
+def workout_template_changed(sender, instance, **kwargs):
+    """Drop the cached payload of an edited template"""
+    invalidate_template_payload(instance.id)
+
+
+@receiver([post_save, post_delete], sender=WorkoutTemplateExercise)
+def workout_template_exercise_changed(sender, instance, **kwargs):
+    """Drop the cached payload of a template whose exercises changed"""
+    invalidate_template_payload(instance.template_id)
+
+
+@receiver(post_save, sender=Exercise)
+def exercise_changed(sender, instance, **kwargs):
+    """Drop the cached payloads of templates that embed an edited exercise"""
+    template_ids = WorkoutTemplateExercise.objects.filter(exercise=instance).values_list('template_id', flat=True).distinct()
+    for template_id in template_ids:
+        invalidate_template_payload(template_id)
+
+
+@receiver(post_save, sender=ExerciseType)
+def exercise_type_changed(sender, instance, **kwargs):
+    """Drop the cached payloads of templates that embed exercises of an edited type"""
+    template_ids = WorkoutTemplateExercise.objects.filter(exercise__exercise_type=instance).values_list('template_id', flat=True).distinct()
+    for template_id in template_ids:
+        invalidate_template_payload(template_id)
+
+
+@receiver([post_save, post_delete], sender=Exercise)
+@receiver([post_save, post_delete], sender=ExerciseType)
+def exercise_catalogue_changed(sender, instance, **kwargs):
+    """Rebuild the cached exercise catalogue after admins edit it"""
+    bump_catalogue_version()
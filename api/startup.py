@@ -0,0 +1,100 @@
+"""
+Measuring how long a new worker takes to start serving requests.
+
+Every measurement starts a fresh interpreter, so modules already imported by the measuring
+process cannot hide their cost. Used by `python manage.py profile_startup` and the api_profile
+benchmark.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+
+# Startup phases, in the order the measuring script runs them
+PHASES = ['settings', 'apps', 'middleware', 'warm_up', 'first_request', 'second_request']
+
+# Run in the fresh interpreter with the path to request and whether to warm up as arguments;
+# prints one JSON object with milliseconds per phase and module counts
+_SCRIPT = """
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+timings = {}
+last = time.perf_counter()
+
+def lap(phase):
+    global last
+    now = time.perf_counter()
+    timings[phase] = (now - last) * 1000
+    last = now
+
+def request(application, path):
+    environ = {'PATH_INFO': path, 'HTTP_HOST': 'localhost'}
+    setup_testing_defaults(environ)
+    application(environ, lambda status, headers: None).close()
+
+path, warm = sys.argv[1], sys.argv[2] == '1'
+
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+lap('settings')
+django.setup(set_prefix=False)
+lap('apps')
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+lap('middleware')
+if warm:
+    from cyclesync.preload import warm_up
+    warm_up()
+lap('warm_up')
+modules = len(sys.modules)
+request(application, path)
+lap('first_request')
+first_request_modules = len(sys.modules) - modules
+request(application, path)
+lap('second_request')
+
+print(json.dumps({'timings': timings, 'modules': len(sys.modules), 'first_request_modules': first_request_modules}))
+"""
+
+
+def measure_startup(settings_module=None, path='/api/user/', warm_up=True, import_times=False):
+    """
+    Start a worker in a fresh interpreter and serve `path` twice. Returns a dict with
+    milliseconds per phase under 'timings', the number of modules loaded under 'modules' and
+    'first_request_modules', and with import_times=True the `-X importtime` records under 'imports'.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module or settings.SETTINGS_MODULE}
+    command = [sys.executable, *(['-X', 'importtime'] if import_times else []), '-c', _SCRIPT, path, '1' if warm_up else '0']
+    result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"Worker failed to start: {result.stderr.strip().splitlines()[-1]}")
+
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    if import_times:
+        measurement['imports'] = parse_import_times(result.stderr)
+    return measurement
+
+
+def parse_import_times(output):
+    """Parse `python -X importtime` output into (module, self microseconds, cumulative microseconds, depth) tuples"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def import_time_by_package(imports):
+    """Total the self time of imports per top-level package, in microseconds, slowest first"""
+    totals = defaultdict(int)
+    for name, self_us, _, _ in imports:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,85 @@
+import random
+from datetime import date as Date, timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from .analytics import rebuild_symptom_rollups
+from .models import Exercise, Workout, WorkoutExercise, WorkoutLog, Phase, Cycle, CyclePhase, CycleLog, CycleLogSymptom, Symptom
+
+User = get_user_model()
+
+SYMPTOM_NAMES = ["Cramps", "Fatigue", "Bloating", "Headache", "Mood Swings", "Back Pain"]
+
+
+@transaction.atomic
+def create_synthetic_user(email, years=5, seed=None):
+    """Create a user with `years` of cycles, period logs, symptoms, workouts and workout logs ending today"""
+    rng = random.Random(seed)
+    user = User.objects.create_user(email=email, name="Synthetic User")
+
+    # Workouts built from the exercise catalogue
+    exercise_ids = list(Exercise.objects.values_list('id', flat=True))
+    workouts = Workout.objects.bulk_create([Workout(user=user, name=f"Workout {i + 1}") for i in range(4)])
+    WorkoutExercise.objects.bulk_create([
+        WorkoutExercise(
+            workout=workout,
+            exercise_id=exercise_id,
+            sets=rng.randint(2, 5),
+            reps=rng.randint(5, 15),
+            weight=Decimal(rng.randint(5, 100)),
+        )
+        for workout in workouts
+        for exercise_id in rng.sample(exercise_ids, min(6, len(exercise_ids)))
+    ])
+
+    # Consecutive cycles with their four phases
+    phase_lengths = [
+        (Phase.objects.get(name="Menstrual"), user.menstrual_length),
+        (Phase.objects.get(name="Follicular"), user.follicular_length),
+        (Phase.objects.get(name="Ovulatory"), user.ovulation_length),
+        (Phase.objects.get(name="Luteal"), user.luteal_length),
+    ]
+    cycle_length = sum(length for _, length in phase_lengths)
+    today = Date.today()
+    start_date = today - timedelta(days=365 * years)
+
+    cycles = []
+    while start_date <= today:
+        cycles.append(Cycle(user=user, start_date=start_date, cycle_length=cycle_length))
+        start_date += timedelta(days=cycle_length)
+    Cycle.objects.bulk_create(cycles)
+
+    cycle_phases = []
+    for cycle in cycles:
+        phase_start = cycle.start_date
+        for phase, length in phase_lengths:
+            phase_end = phase_start + timedelta(days=length - 1)
+            cycle_phases.append(CyclePhase(cycle=cycle, phase=phase, start_date=phase_start, end_date=phase_end))
+            phase_start = phase_end + timedelta(days=1)
+    CyclePhase.objects.bulk_create(cycle_phases)
+
+    # Period logs on every menstrual day, with a few symptoms each
+    symptoms = [Symptom.objects.get_or_create(symptom_name=name)[0] for name in SYMPTOM_NAMES]
+    cycle_logs = [
+        CycleLog(cycle_phase=cycle_phase, date=cycle_phase.start_date + timedelta(days=offset))
+        for cycle_phase in cycle_phases[::len(phase_lengths)]
+        for offset in range((cycle_phase.end_date - cycle_phase.start_date).days + 1)
+    ]
+    CycleLog.objects.bulk_create(cycle_logs)
+    CycleLogSymptom.objects.bulk_create([
+        CycleLogSymptom(cycle_log=cycle_log, symptom=symptom)
+        for cycle_log in cycle_logs
+        for symptom in rng.sample(symptoms, rng.randint(0, 3))
+    ])
+
+    # Workouts logged on roughly four days a week
+    WorkoutLog.objects.bulk_create([
+        WorkoutLog(user=user, workout=rng.choice(workouts), date=today - timedelta(days=offset))
+        for offset in range(365 * years)
+        if rng.random() < 4 / 7
+    ])
+
+    # Bulk inserts skip the signals, so build this user's symptom analytics in one go
+    rebuild_symptom_rollups(user=user)
+
+    return user
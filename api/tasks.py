@@ -0,0 +1,152 @@
+"""
+Background jobs for work too large to run inside a request.
+
+Jobs are rows in the Job table. With TASK_BACKEND = 'thread' (the default) they run on an
+in-process thread pool once the enqueuing transaction commits; with 'database' they wait there
+until a `python manage.py run_worker` process claims them.
+
+A job whose worker died stays RUNNING; requeue_stale_jobs() queues it again after
+TASK_STALE_AFTER seconds, and fails it once it has been started TASK_MAX_ATTEMPTS times.
+"""
+
+import logging
+import os
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Task name -> function called with the job's payload as keyword arguments
+TASKS = {}
+
+_executor = None
+
+
+def task(name):
+    """Register a function as a background task called `name`"""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, user=None, **payload):
+    """Create a job for a registered task and hand it to the configured backend"""
+    if name not in TASKS:
+        raise KeyError(f"Unknown task {name}")
+
+    job = Job.objects.create(name=name, user=user, payload=payload)
+    if settings.TASK_BACKEND == 'thread':
+        # Nothing else polls the table in this mode, so jobs lost by a dead process are picked up here
+        job_ids = [job.pk, *requeue_stale_jobs()]
+        transaction.on_commit(lambda: [_get_executor().submit(_run_in_thread, job_id) for job_id in job_ids])
+    return job
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.TASK_THREADS, thread_name_prefix='task')
+    return _executor
+
+
+def _reset_executor_after_fork():
+    # Pool threads started before gunicorn forks do not exist in the workers
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_reset_executor_after_fork)
+
+
+def _run_in_thread(job_id):
+    try:
+        if claim_job(job_id):
+            run_job(Job.objects.get(pk=job_id))
+    finally:
+        # Threads in the pool outlive the job, so do not leave a connection open
+        connections.close_all()
+
+
+def claim_job(job_id):
+    """Mark a queued job as running, returning False if another worker claimed it first"""
+    return Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+        status=Job.RUNNING,
+        started_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    ) == 1
+
+
+def requeue_stale_jobs():
+    """Queue again jobs left RUNNING by a worker that died, failing those out of attempts; returns the requeued ids"""
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=settings.TASK_STALE_AFTER))
+    stale.filter(attempts__gte=settings.TASK_MAX_ATTEMPTS).update(
+        status=Job.FAILED,
+        error=f"Worker lost {settings.TASK_MAX_ATTEMPTS} times",
+        finished_at=timezone.now(),
+    )
+    job_ids = list(stale.values_list('pk', flat=True))
+    requeued = [job_id for job_id in job_ids if Job.objects.filter(pk=job_id, status=Job.RUNNING).update(status=Job.QUEUED)]
+    for job_id in requeued:
+        logger.warning("Requeued job %s after its worker was lost", job_id)
+    return requeued
+
+
+def claim_next_job():
+    """Claim the oldest queued job, or return None if the queue is empty"""
+    for job_id in Job.objects.filter(status=Job.QUEUED).order_by('created_at').values_list('pk', flat=True)[:10]:
+        if claim_job(job_id):
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    """Run a claimed job and record its result or error"""
+    close_old_connections()
+    try:
+        job.result = TASKS[job.name](**job.payload)
+        job.status = Job.SUCCEEDED
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job.pk, job.name)
+        job.status = Job.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return job
+
+
+@task('delete_account')
+def delete_account_task(user_id):
+    from .deletion import delete_account
+    return delete_account(user_id)
+
+
+@task('recompute_cycles')
+def recompute_cycles_task(user_id, all_cycles=False):
+    from django.contrib.auth import get_user_model
+    from .cycles import recompute_current_cycle, recompute_cycles
+
+    user = get_user_model().objects.get(pk=user_id)
+    if all_cycles:
+        cycles, logs_moved = recompute_cycles(user)
+        return {"cycles_updated": len(cycles), "logs_moved": logs_moved}
+
+    cycle = recompute_current_cycle(user)
+    return {"cycles_updated": 1 if cycle else 0}
+
+
+@task('export_user_data')
+def export_user_data_task(user_id):
+    from .transfer import export_user_data
+    return export_user_data(user_id)
+
+
+@task('import_user_data')
+def import_user_data_task(user_id, data):
+    from .transfer import import_user_data
+    return import_user_data(user_id, data)
@@ -1,3 +1,926 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import UTC, date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_delete
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework.views import APIView
+from cyclesync.logconfig import JsonFormatter, QueueListenerHandler
+from cyclesync.routers import ReplicaRouter, use_replica
+from . import deletion, renderers, tasks
+from .analytics import phase_training_volume, rebuild_symptom_rollups
+from .cycles import recompute_cycles
+from .labels import LazyLabels, resolve_labels, with_labels
+from .metrics import MetricsRegistry, RequestMetrics
+from .middleware import CompressionMiddleware
+from .pagination import KeysetPagination
+from .search import ExerciseIndex, get_exercise_index
+from .models import Cycle, CycleLog, CycleLogSymptom, CyclePhase, Exercise, ExerciseType, IdempotencyKey, Job, Symptom, SymptomRollup, Workout, WorkoutExercise, WorkoutLog, WorkoutTemplate, WorkoutTemplateExercise
+from .synthetic import create_synthetic_user
+from .throttling import SharedMemoryBucketStore, parse_rate
+from .views import LogPeriodView, ReplicaRoutingMixin
 
-# Create your tests here.
+User = get_user_model()
+
+# Test clients share one address and user ids repeat between runs, so rate limits are turned off
+UNTHROTTLED = override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {scope: None for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']},
+})
+
+
+@UNTHROTTLED
+class AuthenticatedAPITestCase(APITestCase):
+    def setUp(self):
+        # Cached payloads are keyed by ids, which the next test reuses
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='password', name='User')
+        self.client.force_authenticate(self.user)
+
+    def log_period(self, day, **headers):
+        return self.client.post(f'/api/log-period/{day.isoformat()}/', **headers)
+
+
+class SymptomRollupTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.log_period(date(2025, 1, 1))
+        self.first_day = CycleLog.objects.get(cycle_phase__cycle__user=self.user, date=date(2025, 1, 1))
+        self.third_day = CycleLog.objects.create(cycle_phase=self.first_day.cycle_phase, date=date(2025, 1, 3))
+        self.cramps = Symptom.objects.create(symptom_name='Cramps')
+        self.headache = Symptom.objects.create(symptom_name='Headache')
+
+    def rollups(self):
+        return set(SymptomRollup.objects.filter(user=self.user, count__gt=0).values_list('phase__name', 'symptom__symptom_name', 'cycle_day', 'count'))
+
+    def test_logging_and_removing_symptoms_updates_the_rollups(self):
+        CycleLogSymptom.objects.create(cycle_log=self.first_day, symptom=self.cramps)
+        headache = CycleLogSymptom.objects.create(cycle_log=self.third_day, symptom=self.headache)
+        self.assertEqual(self.rollups(), {('Menstrual', 'Cramps', 1, 1), ('Menstrual', 'Headache', 3, 1)})
+
+        headache.delete()
+        self.assertEqual(self.rollups(), {('Menstrual', 'Cramps', 1, 1)})
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        for log, symptom in [(self.first_day, self.cramps), (self.first_day, self.headache), (self.third_day, self.cramps)]:
+            CycleLogSymptom.objects.create(cycle_log=log, symptom=symptom)
+        incremental = self.rollups()
+
+        SymptomRollup.objects.all().delete()
+        self.assertEqual(rebuild_symptom_rollups(user=self.user), 3)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_analytics_endpoint_summarises_the_rollups(self):
+        CycleLogSymptom.objects.create(cycle_log=self.first_day, symptom=self.cramps)
+        CycleLogSymptom.objects.create(cycle_log=self.third_day, symptom=self.cramps)
+
+        response = self.client.get('/api/analytics/symptoms/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'by_phase': {'Menstrual': {'Cramps': 2}},
+            'by_cycle_day': {'1': {'Cramps': 1}, '3': {'Cramps': 1}},
+        })
+
+
+
+class WorkoutTemplateTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.squats, self.lunges = Exercise.objects.order_by('id')[:2]
+        self.template = WorkoutTemplate.objects.create(name='Legs')
+        WorkoutTemplateExercise.objects.create(template=self.template, exercise=self.squats, sets=3, reps=5)
+
+    def create_from_template(self, name):
+        response = self.client.post('/api/workouts/', {'name': name, 'template': self.template.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Workout.objects.get(user=self.user, name=name)
+
+    def exercise_names(self, workout_id):
+        response = self.client.get(f'/api/workouts/{workout_id}/')
+        return [exercise['exercise']['name'] for exercise in response.json()['workout_exercises']]
+
+    def test_workout_from_template_shares_its_exercises(self):
+        workout = self.create_from_template('Monday')
+
+        self.assertEqual(workout.template, self.template)
+        self.assertFalse(WorkoutExercise.objects.filter(workout=workout).exists())
+        self.assertEqual(self.exercise_names(workout.id), [self.squats.name])
+
+    def test_renaming_keeps_sharing_the_template(self):
+        workout = self.create_from_template('Monday')
+
+        self.client.put(f'/api/workouts/{workout.id}/', {'name': 'Tuesday'}, format='json')
+
+        workout.refresh_from_db()
+        self.assertEqual((workout.name, workout.template), ('Tuesday', self.template))
+
+    def test_editing_exercises_copies_them_and_leaves_the_template_alone(self):
+        edited = self.create_from_template('Monday')
+        untouched = self.create_from_template('Friday')
+
+        response = self.client.put(f'/api/workouts/{edited.id}/', {
+            'workout_exercises': [{'exerciseId': self.lunges.id, 'sets': 4, 'reps': 8, 'weight': '20.00'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        edited.refresh_from_db()
+        self.assertIsNone(edited.template)
+        self.assertEqual(self.exercise_names(edited.id), [self.lunges.name])
+        self.assertEqual(self.exercise_names(untouched.id), [self.squats.name])
+        self.assertEqual(list(self.template.template_exercises.values_list('exercise', flat=True)), [self.squats.id])
+
+    def test_workout_list_fetches_template_payloads_in_one_round_trip(self):
+        arms = WorkoutTemplate.objects.create(name='Arms')
+        WorkoutTemplateExercise.objects.create(template=arms, exercise=self.lunges, sets=3, reps=10)
+        Workout.objects.create(user=self.user, name='Monday', template=self.template)
+        Workout.objects.create(user=self.user, name='Wednesday', template=arms)
+        Workout.objects.create(user=self.user, name='Friday', template=self.template)
+        own = Workout.objects.create(user=self.user, name='Saturday')
+        WorkoutExercise.objects.create(workout=own, exercise=self.squats, sets=5, reps=5)
+        self.client.get('/api/workouts/')
+
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            response = self.client.get('/api/workouts/')
+
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(
+            {workout['name']: [exercise['exercise']['name'] for exercise in workout['workout_exercises']] for workout in response.json()},
+            {'Monday': [self.squats.name], 'Wednesday': [self.lunges.name], 'Friday': [self.squats.name], 'Saturday': [self.squats.name]},
+        )
+
+    def test_template_list_follows_template_edits(self):
+        self.assertEqual(len(self.client.get('/api/workout-templates/').json()[0]['workout_exercises']), 1)
+
+        WorkoutTemplateExercise.objects.create(template=self.template, exercise=self.lunges, sets=3, reps=10)
+
+        self.assertEqual(len(self.client.get('/api/workout-templates/').json()[0]['workout_exercises']), 2)
+
+
+class LogPeriodTests(AuthenticatedAPITestCase):
+    def test_first_log_creates_a_cycle_and_a_repeat_is_a_no_op(self):
+        first = self.log_period(date(2025, 1, 1))
+        repeat = self.log_period(date(2025, 1, 1))
+
+        self.assertEqual((first.status_code, repeat.status_code), (201, 200))
+        self.assertEqual(repeat.json(), {'message': 'Period already logged'})
+        cycle = Cycle.objects.get(user=self.user)
+        self.assertEqual(cycle.phases.count(), 4)
+        self.assertEqual(CycleLog.objects.filter(cycle_phase__cycle=cycle).count(), 1)
+
+    def test_later_day_is_logged_in_the_same_cycle(self):
+        self.log_period(date(2025, 1, 1))
+        response = self.log_period(date(2025, 1, 2))
+
+        self.assertEqual(response.json(), {'message': 'Period logged successfully'})
+        self.assertEqual(Cycle.objects.filter(user=self.user).count(), 1)
+
+    def test_retry_with_idempotency_key_replays_the_first_response(self):
+        first = self.log_period(date(2025, 1, 1), HTTP_IDEMPOTENCY_KEY='retry-1')
+        retry = self.log_period(date(2025, 1, 1), HTTP_IDEMPOTENCY_KEY='retry-1')
+
+        self.assertEqual((retry.status_code, retry.json()), (first.status_code, first.json()))
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Cycle.objects.filter(user=self.user).count(), 1)
+
+    def test_idempotency_keys_are_per_user(self):
+        self.log_period(date(2025, 1, 1), HTTP_IDEMPOTENCY_KEY='shared')
+        other = User.objects.create_user(email='other@example.com', password='password', name='Other')
+        self.client.force_authenticate(other)
+
+        response = self.log_period(date(2025, 3, 1), HTTP_IDEMPOTENCY_KEY='shared')
+
+        self.assertEqual(response.json(), {'message': 'New cycle created and period logged successfully'})
+        self.assertTrue(Cycle.objects.filter(user=other).exists())
+
+    def test_logging_locks_the_user_row(self):
+        with mock.patch.object(User.objects, 'select_for_update', wraps=User.objects.select_for_update) as select_for_update:
+            self.log_period(date(2025, 1, 1))
+        select_for_update.assert_called_once_with()
+
+    def test_losing_a_race_to_the_unique_constraint_reports_already_logged(self):
+        with mock.patch.object(LogPeriodView, '_log_period', side_effect=IntegrityError):
+            response = self.log_period(date(2025, 1, 1), HTTP_IDEMPOTENCY_KEY='race')
+
+        self.assertEqual((response.status_code, response.json()), (200, {'message': 'Period already logged'}))
+        self.assertFalse(IdempotencyKey.objects.filter(user=self.user).exists())
+
+    def test_cycles_are_unique_per_user_and_start_date(self):
+        Cycle.objects.create(user=self.user, start_date=date(2025, 1, 1))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cycle.objects.create(user=self.user, start_date=date(2025, 1, 1))
+
+
+@override_settings(TASK_BACKEND='database')
+class BackgroundJobTests(AuthenticatedAPITestCase):
+    def run_worker(self):
+        call_command('run_worker', once=True, stdout=io.StringIO())
+
+    def test_phase_length_change_recomputes_the_current_cycle_in_a_job(self):
+        self.log_period(date.today() - timedelta(days=3))
+
+        response = self.client.put('/api/user/', {'menstrual_length': 7}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(job.status, Job.QUEUED)
+
+        self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.SUCCEEDED, {'cycles_updated': 1}))
+        self.assertEqual(Cycle.objects.get(user=self.user).cycle_length, 7 + 9 + 1 + 13)
+
+    def test_account_deletion_deactivates_then_deletes_in_a_job(self):
+        self.log_period(date(2025, 1, 1))
+
+        with self.assertLogs('api.views', 'INFO'):
+            response = self.client.delete('/api/delete-account/')
+        self.assertEqual(response.status_code, 202)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        self.run_worker()
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(Job.objects.get(pk=response.json()['job_id']).status, Job.SUCCEEDED)
+
+    def test_stale_running_jobs_are_requeued_until_out_of_attempts(self):
+        started = timezone.now() - timedelta(seconds=settings.TASK_STALE_AFTER + 60)
+        lost = Job.objects.create(name='recompute_cycles', status=Job.RUNNING, attempts=1, started_at=started)
+        exhausted = Job.objects.create(name='recompute_cycles', status=Job.RUNNING, attempts=settings.TASK_MAX_ATTEMPTS, started_at=started)
+        running = Job.objects.create(name='recompute_cycles', status=Job.RUNNING, attempts=1, started_at=timezone.now())
+
+        with self.assertLogs('api.tasks', 'WARNING'):
+            self.assertEqual(tasks.requeue_stale_jobs(), [lost.pk])
+
+        statuses = {job.pk: job.status for job in Job.objects.all()}
+        self.assertEqual(statuses, {lost.pk: Job.QUEUED, exhausted.pk: Job.FAILED, running.pk: Job.RUNNING})
+
+    @override_settings(TASK_BACKEND='thread')
+    def test_thread_backend_runs_the_job_and_lost_jobs_after_commit(self):
+        started = timezone.now() - timedelta(seconds=settings.TASK_STALE_AFTER + 60)
+        lost = Job.objects.create(name='recompute_cycles', status=Job.RUNNING, attempts=1, started_at=started)
+
+        executor = mock.Mock()
+        with mock.patch.object(tasks, '_get_executor', return_value=executor), self.assertLogs('api.tasks', 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                job = tasks.enqueue('recompute_cycles', user=self.user, user_id=self.user.pk)
+                executor.submit.assert_not_called()
+
+        self.assertEqual(
+            [call.args for call in executor.submit.call_args_list],
+            [(tasks._run_in_thread, job.pk), (tasks._run_in_thread, lost.pk)],
+        )
+
+
+class CycleRecomputeTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.log_period(date(2025, 1, 1))
+        self.cycle = Cycle.objects.get(user=self.user)
+        # Day 7 is in the follicular phase with the default 5 day menstrual phase
+        self.follicular = self.cycle.phases.get(phase__name='Follicular')
+        self.day_seven = CycleLog.objects.create(cycle_phase=self.follicular, date=date(2025, 1, 7))
+        CycleLogSymptom.objects.create(cycle_log=self.day_seven, symptom=Symptom.objects.create(symptom_name='Cramps'))
+
+    def set_phase_length(self, field, days):
+        setattr(self.user, field, days)
+        self.user.save()
+
+    def test_logs_move_to_the_phase_that_now_covers_them(self):
+        # Day 7 is in the ovulatory phase once the follicular phase is a single day
+        self.set_phase_length('follicular_length', 1)
+
+        cycles, moved = recompute_cycles(self.user)
+
+        self.assertEqual((len(cycles), moved), (1, 1))
+        self.day_seven.refresh_from_db()
+        self.assertEqual(self.day_seven.cycle_phase.phase.name, 'Ovulatory')
+        ovulatory = self.cycle.phases.get(phase__name='Ovulatory')
+        self.assertEqual((ovulatory.start_date, ovulatory.end_date), (date(2025, 1, 7), date(2025, 1, 7)))
+        self.cycle.refresh_from_db()
+        self.assertEqual(self.cycle.cycle_length, 5 + 1 + 1 + 13)
+        # The rollups count symptoms per phase, so they follow the moved log
+        self.assertEqual(
+            list(SymptomRollup.objects.filter(user=self.user, count__gt=0).values_list('phase__name', 'cycle_day')),
+            [('Ovulatory', 7)],
+        )
+
+    def test_log_is_left_in_place_rather_than_merged_into_an_existing_one(self):
+        ovulatory = self.cycle.phases.get(phase__name='Ovulatory')
+        CycleLog.objects.create(cycle_phase=ovulatory, date=date(2025, 1, 7))
+        self.set_phase_length('follicular_length', 1)
+
+        _, moved = recompute_cycles(self.user)
+
+        self.assertEqual(moved, 0)
+        self.day_seven.refresh_from_db()
+        self.assertEqual(self.day_seven.cycle_phase, self.follicular)
+
+    def test_logs_are_not_moved_into_the_menstrual_phase(self):
+        self.set_phase_length('menstrual_length', 8)
+
+        _, moved = recompute_cycles(self.user)
+
+        self.assertEqual(moved, 0)
+        self.day_seven.refresh_from_db()
+        self.assertEqual(self.day_seven.cycle_phase, self.follicular)
+
+    @override_settings(TASK_BACKEND='database')
+    def test_shorter_menstrual_phase_keeps_every_logged_period_day(self):
+        for day in range(2, 6):
+            self.log_period(date(2025, 1, day))
+
+        response = self.client.put('/api/user/', {'menstrual_length': 3, 'recompute_all_cycles': True}, format='json')
+        self.assertEqual(response.status_code, 202)
+        call_command('run_worker', once=True, stdout=io.StringIO())
+
+        menstrual = self.cycle.phases.get(phase__name='Menstrual')
+        self.assertEqual(menstrual.end_date, date(2025, 1, 3))
+        self.assertEqual(
+            self.client.get('/api/period-dates/').json()['period_dates'],
+            [f'2025-01-0{day}' for day in range(1, 6)],
+        )
+
+    def test_queries_do_not_grow_with_the_number_of_cycles(self):
+        self.set_phase_length('follicular_length', 1)
+        with CaptureQueriesContext(connection) as one_cycle:
+            recompute_cycles(self.user)
+
+        for day in (date(2025, 2, 1), date(2025, 3, 1), date(2025, 4, 1)):
+            self.log_period(day)
+        self.set_phase_length('follicular_length', 9)
+        with CaptureQueriesContext(connection) as four_cycles:
+            _, moved = recompute_cycles(self.user)
+
+        self.assertEqual(moved, 1)
+        self.assertEqual(len(four_cycles), len(one_cycle))
+        self.assertEqual(set(Cycle.objects.filter(user=self.user).values_list('cycle_length', flat=True)), {5 + 9 + 1 + 13})
+
+
+class CompressionMiddlewareTests(TestCase):
+    body = b'{"items": [' + b', '.join(b'{"name": "squat", "sets": 3}' for _ in range(100)) + b']}'
+
+    def respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/api/workouts/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_json_and_weakens_its_etag(self):
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = '"abc"'
+
+        response = self.respond(response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_client_without_accept_encoding_gets_the_plain_body_and_a_vary_header(self):
+        response = self.respond(HttpResponse(self.body, content_type='application/json'), accept_encoding='')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_skips_responses_it_must_not_compress(self):
+        small = HttpResponse(b'{"ok": true}', content_type='application/json')
+        image = HttpResponse(self.body, content_type='image/png')
+        encoded = HttpResponse(self.body, content_type='application/json')
+        encoded['Content-Encoding'] = 'br'
+        streaming = StreamingHttpResponse(iter([self.body]), content_type='application/json')
+
+        for response in (small, image, encoded, streaming):
+            with self.subTest(content_type=response['Content-Type'], encoding=response.get('Content-Encoding')):
+                self.assertIs(self.respond(response), response)
+                self.assertEqual(response.get('Content-Encoding'), 'br' if response is encoded else None)
+                self.assertFalse(response.has_header('Vary'))
+
+    def test_keeps_the_plain_body_when_compression_does_not_shrink_it(self):
+        incompressible = os.urandom(4096)
+        response = self.respond(HttpResponse(incompressible, content_type='application/json'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, incompressible)
+
+
+class ExerciseCatalogueTests(AuthenticatedAPITestCase):
+    def get(self, accept_encoding='', if_none_match=None):
+        headers = {'HTTP_ACCEPT_ENCODING': accept_encoding}
+        if if_none_match is not None:
+            headers['HTTP_IF_NONE_MATCH'] = if_none_match
+        return self.client.get('/api/exercises/', **headers)
+
+    def test_each_encoding_has_its_own_etag(self):
+        etags = {encoding: self.get(encoding)['ETag'] for encoding in ('', 'gzip', 'br')}
+
+        self.assertEqual(len(set(etags.values())), 3)
+        self.assertEqual(self.get('gzip')['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', self.get('gzip')['Vary'])
+
+    def test_if_none_match_is_parsed_as_a_list_of_etags(self):
+        etag = self.get('gzip')['ETag']
+
+        self.assertEqual(self.get('gzip', f'"other", {etag}').status_code, 304)
+        self.assertEqual(self.get('gzip', f'W/{etag}').status_code, 304)
+        self.assertEqual(self.get('gzip', '*').status_code, 304)
+        # A tag for another encoding, or part of a tag, is not a match
+        self.assertEqual(self.get('br', etag).status_code, 200)
+        self.assertEqual(self.get('gzip', etag[:12]).status_code, 200)
+
+
+class KeysetPaginationTests(AuthenticatedAPITestCase):
+    def walk(self, queryset, ordering, url):
+        """Follow the next links from url to the end, returning the ids of every page"""
+        pages = []
+        while url:
+            paginator = KeysetPagination(ordering=ordering)
+            page = paginator.paginate_queryset(queryset, Request(APIRequestFactory().get(url)))
+            pages.append([workout.id for workout in page])
+            url = paginator.get_next_link()
+        return pages
+
+    def test_pages_cover_ties_in_the_ordering_key_exactly_once(self):
+        # Seven workouts share a name, more than a page, so pages must split between equal keys
+        names = ['A', 'B', 'B', 'B', 'B', 'B', 'B', 'B', 'C', 'D']
+        workouts = Workout.objects.bulk_create([Workout(user=self.user, name=name) for name in names])
+        queryset = Workout.objects.filter(user=self.user)
+
+        pages = self.walk(queryset, 'name', 'http://testserver/api/workouts/?page_size=3')
+
+        self.assertEqual(len(pages), 4)
+        self.assertEqual(sorted(sum(pages, [])), sorted(workout.id for workout in workouts))
+
+    def test_list_endpoints_keep_their_shape_unless_a_page_is_asked_for(self):
+        for day in (date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3)):
+            self.log_period(day)
+
+        whole = self.client.get('/api/period-dates/').json()
+        first = self.client.get('/api/period-dates/?page_size=2').json()
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual(whole, {'period_dates': ['2025-01-01', '2025-01-02', '2025-01-03']})
+        self.assertEqual(first['period_dates'] + second['period_dates'], whole['period_dates'])
+        self.assertIsNone(second['next'])
+        self.assertIsInstance(self.client.get('/api/workouts/').json(), list)
+
+    def test_page_size_is_capped(self):
+        Workout.objects.bulk_create([Workout(user=self.user, name=f'Workout {i}') for i in range(KeysetPagination.max_page_size + 1)])
+
+        response = self.client.get(f'/api/workouts/?page_size={KeysetPagination.max_page_size * 2}')
+
+        self.assertEqual(len(response.json()['results']), KeysetPagination.max_page_size)
+        self.assertIsNotNone(response.json()['next'])
+
+
+class SparseFieldsetTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.squats = Exercise.objects.order_by('id').first()
+        self.workout = Workout.objects.create(user=self.user, name='Legs')
+        WorkoutExercise.objects.create(workout=self.workout, exercise=self.squats, sets=3, reps=5)
+        WorkoutLog.objects.create(user=self.user, workout=self.workout, date=date(2025, 1, 1))
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Leave out the session and savepoint queries of the test client
+        return response.json(), [query['sql'] for query in queries if 'api_' in query['sql']]
+
+    def test_selected_fields_are_the_only_columns_read(self):
+        data, queries = self.get('/api/workouts/?fields=id,name')
+
+        self.assertEqual(data, [{'id': self.workout.id, 'name': 'Legs'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('created_at', queries[0])
+        self.assertNotIn('api_workoutexercise', queries[0])
+
+    def test_dotted_fields_select_nested_fields(self):
+        data, _ = self.get('/api/workouts/?fields=name,workout_exercises.exercise.name')
+
+        self.assertEqual(data, [{'name': 'Legs', 'workout_exercises': [{'exercise': {'name': self.squats.name}}]}])
+
+    def test_expand_embeds_the_related_object(self):
+        plain, _ = self.get('/api/workout-logs/')
+        expanded, _ = self.get('/api/workout-logs/?expand=workout&fields=date,workout.name')
+
+        self.assertEqual(plain[0]['workout'], self.workout.id)
+        self.assertEqual(expanded, [{'date': '2025-01-01', 'workout': {'name': 'Legs'}}])
+
+    def test_unknown_fields_are_ignored_and_no_selection_changes_nothing(self):
+        data, _ = self.get('/api/workouts/?fields=bogus')
+        full, _ = self.get('/api/workouts/')
+
+        self.assertEqual(data, [{}])
+        self.assertEqual(set(full[0]), {'id', 'name', 'created_at', 'template', 'workout_exercises'})
+
+    def test_exercise_catalogue_fields(self):
+        data, queries = self.get('/api/exercises/?fields=name')
+
+        self.assertEqual(data[0], {'name': self.squats.name})
+        self.assertEqual(len(queries), 1)
+
+
+class MessagePackTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.workout = Workout.objects.create(user=self.user, name='Legs')
+
+    def as_json(self, data):
+        return json.loads(JSONRenderer().render(data))
+
+    def test_round_trip_keeps_dates_and_sends_the_rest_as_json_does(self):
+        data = {
+            'day': date(1969, 12, 31),
+            'days': [date(2025, 1, 1), date(2025, 1, 29)],
+            'rows': [{'date': date(2025, 1, 1), 'weight': Decimal('20.00')}, {'date': date(2025, 1, 2), 'weight': Decimal('22.50')}],
+            'at': datetime(2025, 1, 1, 8, 30, tzinfo=UTC),
+        }
+
+        unpacked = renderers.unpackb(renderers.packb(data))
+
+        self.assertEqual(unpacked['day'], date(1969, 12, 31))
+        self.assertEqual(unpacked['days'], [date(2025, 1, 1), date(2025, 1, 29)])
+        self.assertEqual([row['date'] for row in unpacked['rows']], [date(2025, 1, 1), date(2025, 1, 2)])
+        self.assertEqual(self.as_json(unpacked), self.as_json(data))
+
+    def test_responses_match_json(self):
+        for day in (1, 2, 3):
+            WorkoutLog.objects.create(user=self.user, workout=self.workout, date=date(2025, 1, day))
+        self.log_period(date(2025, 1, 1))
+
+        for url in ('/api/workout-logs/', '/api/period-dates/'):
+            packed = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+            as_json = self.client.get(url)
+
+            self.assertEqual(packed['Content-Type'], 'application/msgpack')
+            self.assertIn('Accept', packed['Vary'])
+            self.assertEqual(self.as_json(renderers.unpackb(packed.content)), as_json.json(), url)
+
+    def test_request_bodies(self):
+        response = self.client.post('/api/workout-logs/', renderers.packb({'workout': self.workout.id, 'date': date(2025, 1, 1)}),
+                                    content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(WorkoutLog.objects.filter(user=self.user, date=date(2025, 1, 1)).exists())
+
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.post('/api/workout-logs/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+
+
+class RoutedView(ReplicaRoutingMixin, APIView):
+    """Answers with the database the router picks for the request's reads or writes"""
+
+    def get(self, request):
+        if 'fail' in request.query_params:
+            raise RuntimeError("Unhandled")
+        return Response({'db': ReplicaRouter().db_for_read(User)})
+
+    def post(self, request):
+        return Response({'db': ReplicaRouter().db_for_write(User)}, status=201)
+
+
+@UNTHROTTLED
+@mock.patch('api.views.replica_configured', return_value=True)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', password='password', name='User')
+
+    def request(self, method, user=None):
+        request = getattr(APIRequestFactory(), method)('/routed/')
+        force_authenticate(request, user or self.user)
+        return RoutedView.as_view()(request).data['db']
+
+    def test_reads_use_the_primary_outside_routed_requests(self, replica_configured):
+        self.assertFalse(use_replica.get())
+        self.assertEqual(ReplicaRouter().db_for_read(User), 'default')
+        self.assertEqual(ReplicaRouter().db_for_write(User), 'default')
+
+    def test_reads_go_to_the_replica_without_a_recent_write(self, replica_configured):
+        self.assertEqual(self.request('get'), 'replica')
+        # The choice does not leak out of the request
+        self.assertFalse(use_replica.get())
+
+    def test_reads_stay_on_the_primary_after_a_write(self, replica_configured):
+        other = User.objects.create_user(email='other@example.com', password='password', name='Other')
+
+        self.assertEqual(self.request('post'), 'default')
+
+        self.assertEqual(self.request('get'), 'default')
+        self.assertEqual(self.request('get', user=other), 'replica')
+
+    def test_unhandled_exceptions_do_not_leave_reads_on_the_replica(self, replica_configured):
+        request = APIRequestFactory().get('/routed/?fail')
+        force_authenticate(request, self.user)
+        with self.assertRaises(RuntimeError):
+            RoutedView.as_view()(request)
+
+        self.assertFalse(use_replica.get())
+
+    def test_the_database_cache_is_read_from_the_primary(self, replica_configured):
+        cache_entry = DatabaseCache('cyclesync_cache', {}).cache_model_class
+        token = use_replica.set(True)
+        try:
+            self.assertEqual(ReplicaRouter().db_for_read(cache_entry), 'default')
+            self.assertEqual(ReplicaRouter().db_for_read(User), 'replica')
+        finally:
+            use_replica.reset(token)
+
+    def test_reads_use_the_primary_without_a_replica(self, replica_configured):
+        replica_configured.return_value = False
+        self.assertEqual(self.request('get'), 'default')
+
+
+class EmailCaseTests(AuthenticatedAPITestCase):
+    def test_signup_with_a_case_variant_of_a_taken_email_is_rejected(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.post('/api/signup/', {'email': 'User@Example.com', 'password': 'password', 'name': 'User'}, format='json')
+
+        self.assertEqual((response.status_code, response.json()), (400, {'error': "Email already exists"}))
+        self.assertEqual(User.objects.filter(email__iexact='user@example.com').count(), 1)
+
+    def test_changing_email_to_a_case_variant_of_another_account_is_rejected(self):
+        User.objects.create_user(email='other@example.com', password='password', name='Other')
+
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.put('/api/user/', {'email': 'OTHER@example.com'}, format='json')
+
+        self.assertEqual((response.status_code, response.json()), (400, {'error': "Email already exists"}))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'user@example.com')
+
+    def test_login_ignores_the_case_of_the_email(self):
+        self.client.force_authenticate(None)
+
+        response = self.client.post('/api/login/', {'email': 'USER@EXAMPLE.COM', 'password': 'password'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json())
+
+
+class LabelTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for day in (1, 2):
+            self.log_period(date(2025, 1, day))
+        workout = Workout.objects.create(user=self.user, name='Legs')
+        WorkoutLog.objects.create(user=self.user, workout=workout, date=date(2025, 1, 1))
+
+    def objects(self):
+        """Fresh instances with none of their relations loaded"""
+        return [
+            *CycleLog.objects.order_by('date'),
+            *CyclePhase.objects.filter(phase__name='Menstrual'),
+            *Workout.objects.all(),
+            *WorkoutLog.objects.all(),
+        ]
+
+    # What __str__ returned when it followed the foreign keys itself
+    labels = [
+        "Log for Menstrual phase on 2025-01-01 for user@example.com",
+        "Log for Menstrual phase on 2025-01-02 for user@example.com",
+        "Menstrual phase for user@example.com from 2025-01-01 to 2025-01-05",
+        "Legs by user@example.com",
+        "Workout Legs logged for 2025-01-01 by user@example.com",
+    ]
+
+    def test_str_never_queries(self):
+        objects = self.objects()
+
+        with self.assertNumQueries(0):
+            labels = [str(obj) for obj in objects]
+
+        self.assertEqual(labels[0], f"Log for cycle phase {objects[0].cycle_phase_id} on 2025-01-01")
+        self.assertEqual(labels[3], f"Legs by user {self.user.id}")
+
+    def test_resolved_labels_match_the_old_output_with_one_query_per_model(self):
+        objects = self.objects()
+
+        with self.assertNumQueries(4):
+            self.assertEqual(resolve_labels(objects), self.labels)
+
+    def test_labels_of_a_queryset_with_its_label_relations(self):
+        logs = list(with_labels(CycleLog.objects.order_by('date')))
+
+        with self.assertNumQueries(0):
+            self.assertEqual([str(log) for log in logs], self.labels[:2])
+
+    def test_lazy_labels_query_only_when_formatted(self):
+        objects = self.objects()
+
+        with self.assertNumQueries(0):
+            labels = LazyLabels(objects[:2])
+        with self.assertNumQueries(1):
+            self.assertEqual(str(labels), ", ".join(self.labels[:2]))
+
+
+class ExerciseIndexTests(TestCase):
+    index = ExerciseIndex([
+        (1, 'Back Squat', 1, 'Compound'),
+        (2, 'Squat', 1, 'Compound'),
+        (3, 'Bench Press', 1, 'Compound'),
+        (4, 'Leg Extension', 2, 'Isolation'),
+        (5, 'Front Squat', 1, 'Compound'),
+    ])
+
+    def search(self, query, exercise_type=None):
+        return [entry[0] for entry in self.index.search(query, exercise_type=exercise_type)]
+
+    def test_whole_name_prefixes_come_before_word_prefixes(self):
+        self.assertEqual(self.search('squ'), [2, 1, 5])
+        self.assertEqual(self.search('bench pr'), [3])
+
+    def test_substrings_match_through_shared_trigrams(self):
+        self.assertEqual(self.search('quat'), [1, 5, 2])
+        self.assertEqual(self.search('tension'), [4])
+        self.assertEqual(self.search('curl'), [])
+
+    def test_case_and_spacing_are_ignored(self):
+        self.assertEqual(self.search('  BENCH   press'), [3])
+        self.assertEqual(self.search('Squat', exercise_type='COMPOUND'), [2, 1, 5])
+
+    def test_type_filter_by_id_or_name(self):
+        self.assertEqual(self.search('', exercise_type=2), [4])
+        self.assertEqual(self.search('squat', exercise_type='isolation'), [])
+        self.assertEqual(len(self.search('')), 5)
+
+    def test_index_is_rebuilt_after_exercises_change(self):
+        cache.clear()
+        index = get_exercise_index()
+        self.assertIs(get_exercise_index(), index)
+        self.assertEqual(index.search('zottman'), [])
+
+        exercise = Exercise.objects.create(name='Zottman Curl', exercise_type=ExerciseType.objects.get(name='Isolation'))
+        self.assertEqual(get_exercise_index().search('zottman'), [(exercise.id, 'Zottman Curl', exercise.exercise_type_id, 'Isolation')])
+
+        exercise.name = 'Zercher Curl'
+        exercise.save()
+        self.assertEqual(get_exercise_index().search('zottman'), [])
+        self.assertIn(exercise.id, [entry[0] for entry in get_exercise_index().search('zercher curl')])
+
+        exercise_id = exercise.id
+        exercise.delete()
+        self.assertNotIn(exercise_id, [entry[0] for entry in get_exercise_index().search('')])
+
+
+class TrainingVolumeTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # Menstrual Jan 1-5, Follicular Jan 6-14, Ovulatory Jan 15, Luteal Jan 16-28
+        self.log_period(date(2025, 1, 1))
+        first, second = Exercise.objects.order_by('id')[:2]
+
+        self.heavy = Workout.objects.create(user=self.user, name='Heavy')
+        WorkoutExercise.objects.create(workout=self.heavy, exercise=first, sets=3, reps=5, weight=Decimal('100'))
+        WorkoutExercise.objects.create(workout=self.heavy, exercise=second, sets=2, reps=10, weight=Decimal('20.50'))
+        template = WorkoutTemplate.objects.create(name='Template')
+        WorkoutTemplateExercise.objects.create(template=template, exercise=first, sets=4, reps=8, weight=Decimal('50'))
+        WorkoutTemplateExercise.objects.create(template=template, exercise=second, sets=3, reps=12)
+        self.shared = Workout.objects.create(user=self.user, name='Shared', template=template)
+        self.empty = Workout.objects.create(user=self.user, name='Empty')
+
+    def log(self, workout, day):
+        WorkoutLog.objects.create(user=self.user, workout=workout, date=day)
+
+    def test_volumes_per_phase(self):
+        self.log(self.heavy, date(2025, 1, 2))
+        self.log(self.shared, date(2025, 1, 3))
+        self.log(self.heavy, date(2025, 1, 7))
+        self.log(self.empty, date(2025, 1, 16))
+        self.log(self.heavy, date(2025, 2, 20))
+        self.log(self.heavy, date(2025, 3, 1))
+
+        with self.assertNumQueries(1):
+            volumes = phase_training_volume(self.user, date(2025, 1, 1), date(2025, 2, 28))
+
+        heavy = 3 * 5 * Decimal('100') + 2 * 10 * Decimal('20.50')
+        shared = 4 * 8 * Decimal('50')
+        # Ovulatory had no workouts, and the workout after the last cycle has no phase
+        self.assertEqual(volumes, {
+            'Menstrual': {'sessions': 2, 'volume': heavy + shared},
+            'Follicular': {'sessions': 1, 'volume': heavy},
+            'Luteal': {'sessions': 1, 'volume': Decimal('0')},
+            'No Phase': {'sessions': 1, 'volume': heavy},
+        })
+
+    def test_no_workouts(self):
+        self.assertEqual(phase_training_volume(self.user, date(2025, 1, 1), date(2025, 12, 31)), {})
+
+class AccountDeletionTests(TestCase):
+    def setUp(self):
+        self.user = create_synthetic_user('deleted@example.com', years=1, seed=0)
+        self.other = create_synthetic_user('kept@example.com', years=1, seed=1)
+
+    def test_delete_account_removes_only_that_users_data(self):
+        other_logs = CycleLog.objects.filter(cycle_phase__cycle__user=self.other).count()
+
+        counts = deletion.delete_account(self.user.pk, batch_size=50)
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(CycleLogSymptom.objects.filter(cycle_log__cycle_phase__cycle__user=self.user).exists())
+        self.assertFalse(SymptomRollup.objects.filter(user=self.user).exists())
+        self.assertFalse(Workout.objects.filter(user=self.user).exists())
+        self.assertGreater(counts['CycleLog'], 0)
+        self.assertEqual(CycleLog.objects.filter(cycle_phase__cycle__user=self.other).count(), other_logs)
+        self.assertTrue(SymptomRollup.objects.filter(user=self.other).exists())
+
+    def test_delete_without_signals_sends_no_signals(self):
+        receiver = mock.Mock()
+        post_delete.connect(receiver, sender=CycleLogSymptom)
+        self.addCleanup(post_delete.disconnect, receiver, sender=CycleLogSymptom)
+        ids = list(CycleLogSymptom.objects.filter(cycle_log__cycle_phase__cycle__user=self.user).values_list('pk', flat=True))
+        self.assertTrue(ids)
+
+        self.assertEqual(deletion.delete_without_signals(CycleLogSymptom.objects.filter(pk__in=ids), 'default'), len(ids))
+        receiver.assert_not_called()
+
+    def test_delete_without_signals_falls_back_to_delete_on_unchecked_releases(self):
+        queryset = WorkoutLog.objects.filter(user=self.user)
+        expected = queryset.count()
+
+        with mock.patch.object(deletion, 'RAW_DELETE_CHECKED', False):
+            self.assertEqual(deletion.delete_without_signals(queryset, 'default'), expected)
+        self.assertFalse(WorkoutLog.objects.filter(user=self.user).exists())
+
+
+class TokenBucketTests(TestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/min'), (5, 60))
+        self.assertEqual(parse_rate('30/second'), (30, 1))
+        self.assertEqual(parse_rate('1000/day'), (1000, 86400))
+        self.assertEqual(parse_rate(None), (None, None))
+
+    def test_shared_memory_bucket_empties_and_refills(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SharedMemoryBucketStore(os.path.join(directory, 'buckets'), slots=64)
+            results = [store.consume('key', capacity=2, refill_rate=1, now=100)[0] for _ in range(3)]
+            self.assertEqual(results, [True, True, False])
+            self.assertEqual(store.consume('key', capacity=2, refill_rate=1, now=101), (True, 0.0))
+
+
+class MetricsTests(TestCase):
+    def test_query_counts_use_count_buckets(self):
+        registry = MetricsRegistry()
+        for queries in (1, 1, 4, 60):
+            metrics = RequestMetrics()
+            metrics.db_queries = queries
+            registry.record('GET /api/test/', metrics)
+
+        buckets = registry.snapshot()['GET /api/test/']['queries']['buckets']
+        self.assertEqual((buckets['le_1'], buckets['le_5'], buckets['le_100']), (2, 1, 1))
+        self.assertEqual(sum(buckets.values()), 4)
+
+
+class QueueLoggingTests(TestCase):
+    def log_exception(self, formatter):
+        stream = io.StringIO()
+        console = logging.StreamHandler(stream)
+        console.setFormatter(formatter)
+        handler = QueueListenerHandler([console])
+        logger = logging.getLogger('api.tests.queue')
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            try:
+                {}['workout']
+            except KeyError:
+                logger.exception("Could not log workout %s", 7)
+        finally:
+            logger.removeHandler(handler)
+            # Stopping the listener writes out the records still queued
+            handler._stop_listener()
+        return stream.getvalue()
+
+    def test_json_lines_carry_the_exception_apart_from_the_message(self):
+        entry = json.loads(self.log_exception(JsonFormatter()))
+
+        self.assertEqual((entry['level'], entry['logger'], entry['message']), ('ERROR', 'api.tests.queue', "Could not log workout 7"))
+        self.assertTrue(entry['exception'].startswith("Traceback (most recent call last):"))
+        self.assertTrue(entry['exception'].endswith("KeyError: 'workout'"))
+
+    def test_text_lines_are_formatted_by_the_listener(self):
+        output = self.log_exception(logging.Formatter('{levelname} {message}', style='{'))
+
+        self.assertTrue(output.startswith("ERROR Could not log workout 7\nTraceback (most recent call last):"))
@@ -0,0 +1,223 @@
+"""
+Token bucket rate limiting for DRF views.
+
+Each client gets a bucket holding up to `capacity` tokens that refills at capacity / period
+tokens per second; a request spends one token and is throttled when the bucket is empty. Rates
+use DRF's syntax ("5/min") in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], keyed by scope.
+
+Buckets live in THROTTLE_STORE:
+- 'shared_memory': a fixed-size table in a memory-mapped file (THROTTLE_SHARED_MEMORY_PATH)
+  shared by every worker process on the host, guarded by a file lock. The file never grows past
+  slots x 24 bytes (1.5 MiB by default) and deliberately outlives restarts and deploys, so
+  limits carry over; its default name carries the table's layout version, so a release that
+  changes the layout starts a new file. Files of older layouts can be removed by hand, and
+  /dev/shm is emptied on reboot.
+- 'cache': the default Django cache, for deployments spread over several hosts. Updates are
+  not atomic, so concurrent requests from one client may occasionally get an extra token.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class SharedMemoryBucketStore:
+    """
+    Token buckets in an open-addressed hash table in a memory-mapped file.
+
+    Each slot holds a 64 bit key hash, the token count and the last refill time. A lookup
+    probes at most PROBES slots; when they are all taken by other keys the least recently
+    refilled one is reused, which at worst hands that client a full bucket.
+    """
+
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 8
+    # Part of the default file name; bump when SLOT or the probing changes
+    LAYOUT_VERSION = 1
+
+    def __init__(self, path, slots=65536):
+        self.slots = slots
+        self.size = slots * self.SLOT.size
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < self.size:
+                os.ftruncate(self._fd, self.size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, self.size)
+
+    @staticmethod
+    def _hash(key):
+        # Zero marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        """Take a token for key, returning (allowed, seconds until the next token)"""
+        now = time.time() if now is None else now
+        key_hash = self._hash(key)
+        first = key_hash % self.slots
+
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset = None
+                oldest = None
+                for probe in range(self.PROBES):
+                    slot_offset = ((first + probe) % self.slots) * self.SLOT.size
+                    slot_hash, tokens, updated = self.SLOT.unpack_from(self._map, slot_offset)
+                    if slot_hash == key_hash or slot_hash == 0:
+                        offset = slot_offset
+                        break
+                    if oldest is None or updated < oldest[1]:
+                        oldest = (slot_offset, updated)
+
+                if offset is None or slot_hash != key_hash:
+                    offset = offset if offset is not None else oldest[0]
+                    tokens, updated = capacity, now
+
+                allowed, tokens, wait = _take_token(tokens, updated, now, capacity, refill_rate)
+                self.SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+                return allowed, wait
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class CacheBucketStore:
+    """Token buckets stored as (tokens, last refill time) pairs in the Django cache"""
+
+    def __init__(self, cache=cache):
+        self.cache = cache
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        """Take a token for key, returning (allowed, seconds until the next token)"""
+        now = time.time() if now is None else now
+        tokens, updated = self.cache.get(key, (capacity, now))
+        allowed, tokens, wait = _take_token(tokens, updated, now, capacity, refill_rate)
+        # Keep the bucket only as long as it takes to refill completely
+        self.cache.set(key, (tokens, now), timeout=int(capacity / refill_rate) + 1)
+        return allowed, wait
+
+
+def parse_rate(rate):
+    """Turn a DRF style rate such as "5/min" into (requests, seconds), or (None, None) for no limit"""
+    if rate is None:
+        return None, None
+    count, period = rate.split('/')
+    return int(count), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+def _take_token(tokens, updated, now, capacity, refill_rate):
+    """Refill a bucket for the time elapsed and take a token, returning (allowed, tokens left, wait)"""
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill_rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / refill_rate
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _reset_store_after_fork():
+    # flock() locks belong to the open file, so each worker must open the shared memory file itself
+    global _store, _store_lock
+    _store = None
+    _store_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_store_after_fork)
+
+
+def get_bucket_store():
+    """Return the process-wide bucket store selected by THROTTLE_STORE"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.THROTTLE_STORE == 'cache':
+                    _store = CacheBucketStore()
+                else:
+                    path = settings.THROTTLE_SHARED_MEMORY_PATH or os.path.join(
+                        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                        f'cyclesync-throttle-v{SharedMemoryBucketStore.LAYOUT_VERSION}',
+                    )
+                    _store = SharedMemoryBucketStore(path)
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class for token bucket throttles; subclasses set `scope` and implement get_cache_key()"""
+
+    scope = None
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        self.capacity, period = parse_rate(rate)
+        self.refill_rate = self.capacity / period if self.capacity else None
+        self.wait_time = None
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def allow_request(self, request, view):
+        if self.capacity is None:
+            return True
+
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        allowed, self.wait_time = get_bucket_store().consume(key, self.capacity, self.refill_rate)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Limit each authenticated user, and each anonymous client address, to the 'user' rate"""
+
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        ident = request.user.pk if request.user and request.user.is_authenticated else self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """Limit login attempts per client address"""
+
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class RegisterThrottle(LoginThrottle):
+    """Limit sign ups per client address"""
+
+    scope = 'register'
+
+
+class LogPeriodThrottle(UserTokenBucketThrottle):
+    """Limit how often a user can log or remove period dates"""
+
+    scope = 'log_period'
+
+    def get_cache_key(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return super().get_cache_key(request, view)
@@ -0,0 +1,180 @@
+from datetime import date as Date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from .analytics import rebuild_symptom_rollups
+from .models import Exercise, Workout, WorkoutExercise, WorkoutTemplateExercise, WorkoutLog, Phase, Cycle, CyclePhase, CycleLog, CycleLogSymptom, Symptom
+
+User = get_user_model()
+
+EXPORT_VERSION = 1
+
+PROFILE_FIELDS = ['name', 'menstrual_length', 'follicular_length', 'ovulation_length', 'luteal_length']
+
+
+def _exercise_data(row):
+    return {
+        "exercise": row['exercise_id'],
+        "sets": row['sets'],
+        "reps": row['reps'],
+        "weight": str(row['weight']) if row['weight'] is not None else None,
+    }
+
+
+def export_user_data(user_id):
+    """Return all of a user's cycles and workouts as JSON-compatible data, built from a fixed number of queries"""
+    user = User.objects.get(pk=user_id)
+
+    symptoms = {}
+    for row in CycleLogSymptom.objects.filter(cycle_log__cycle_phase__cycle__user=user).values('cycle_log_id', 'symptom__symptom_name'):
+        symptoms.setdefault(row['cycle_log_id'], []).append(row['symptom__symptom_name'])
+
+    logs = {}
+    for row in CycleLog.objects.filter(cycle_phase__cycle__user=user).order_by('date').values('id', 'cycle_phase_id', 'date'):
+        logs.setdefault(row['cycle_phase_id'], []).append({
+            "date": row['date'].isoformat(),
+            "symptoms": symptoms.get(row['id'], []),
+        })
+
+    phases = {}
+    for row in CyclePhase.objects.filter(cycle__user=user).order_by('start_date').values('id', 'cycle_id', 'phase__name', 'start_date', 'end_date'):
+        phases.setdefault(row['cycle_id'], []).append({
+            "phase": row['phase__name'],
+            "start_date": row['start_date'].isoformat(),
+            "end_date": row['end_date'].isoformat(),
+            "logs": logs.get(row['id'], []),
+        })
+
+    cycles = [
+        {
+            "start_date": row['start_date'].isoformat(),
+            "cycle_length": row['cycle_length'],
+            "phases": phases.get(row['id'], []),
+        }
+        for row in Cycle.objects.filter(user=user).order_by('start_date').values('id', 'start_date', 'cycle_length')
+    ]
+
+    # Workouts still sharing a template are exported with the template's exercises
+    workout_rows = list(Workout.objects.filter(user=user).order_by('id').values('id', 'name', 'template_id'))
+    exercises = {}
+    for row in WorkoutExercise.objects.filter(workout__user=user).order_by('id').values('workout_id', 'exercise_id', 'sets', 'reps', 'weight'):
+        exercises.setdefault(row['workout_id'], []).append(_exercise_data(row))
+    template_exercises = {}
+    template_ids = {row['template_id'] for row in workout_rows if row['template_id']}
+    for row in WorkoutTemplateExercise.objects.filter(template_id__in=template_ids).order_by('id').values('template_id', 'exercise_id', 'sets', 'reps', 'weight'):
+        template_exercises.setdefault(row['template_id'], []).append(_exercise_data(row))
+
+    workouts = [
+        {
+            "id": row['id'],
+            "name": row['name'],
+            "exercises": template_exercises.get(row['template_id'], []) if row['template_id'] else exercises.get(row['id'], []),
+        }
+        for row in workout_rows
+    ]
+
+    workout_logs = [
+        {"workout": row['workout_id'], "date": row['date'].isoformat()}
+        for row in WorkoutLog.objects.filter(user=user).order_by('date').values('workout_id', 'date')
+    ]
+
+    return {
+        "version": EXPORT_VERSION,
+        "profile": {field: getattr(user, field) for field in PROFILE_FIELDS},
+        "cycles": cycles,
+        "workouts": workouts,
+        "workout_logs": workout_logs,
+    }
+
+
+@transaction.atomic
+def import_user_data(user_id, data):
+    """
+    Add the cycles, workouts and workout logs from exported data to a user's account with bulk inserts.
+
+    Cycles starting on a date the user already has a cycle for, and workout logs on dates the
+    user already logged a workout, are skipped. Returns the number of rows created per kind.
+    """
+    user = User.objects.get(pk=user_id)
+
+    # Workouts, keyed by their id in the export so workout logs can refer to them
+    known_exercises = set(Exercise.objects.values_list('id', flat=True))
+    workout_data = data.get('workouts', [])
+    workouts = Workout.objects.bulk_create([Workout(user=user, name=workout['name']) for workout in workout_data])
+    workout_ids = {workout['id']: created for workout, created in zip(workout_data, workouts)}
+    workout_exercises = WorkoutExercise.objects.bulk_create([
+        WorkoutExercise(
+            workout=created,
+            exercise_id=exercise['exercise'],
+            sets=exercise['sets'],
+            reps=exercise['reps'],
+            weight=Decimal(exercise['weight']) if exercise.get('weight') is not None else None,
+        )
+        for workout, created in zip(workout_data, workouts)
+        for exercise in workout.get('exercises', [])
+        if exercise['exercise'] in known_exercises
+    ])
+
+    logged_dates = set(WorkoutLog.objects.filter(user=user).values_list('date', flat=True))
+    workout_logs = []
+    for log in data.get('workout_logs', []):
+        log_date = Date.fromisoformat(log['date'])
+        if log['workout'] in workout_ids and log_date not in logged_dates:
+            workout_logs.append(WorkoutLog(user=user, workout=workout_ids[log['workout']], date=log_date))
+            logged_dates.add(log_date)
+    WorkoutLog.objects.bulk_create(workout_logs)
+
+    # Cycles with their phases, period logs and symptoms
+    existing_starts = set(Cycle.objects.filter(user=user).values_list('start_date', flat=True))
+    cycle_data = []
+    for cycle in data.get('cycles', []):
+        start_date = Date.fromisoformat(cycle['start_date'])
+        if start_date not in existing_starts:
+            cycle_data.append(cycle)
+            existing_starts.add(start_date)
+    cycles = Cycle.objects.bulk_create([
+        Cycle(user=user, start_date=Date.fromisoformat(cycle['start_date']), cycle_length=cycle['cycle_length'])
+        for cycle in cycle_data
+    ])
+
+    phase_objects = {phase.name: phase for phase in Phase.objects.all()}
+    phase_data = [(created, phase) for cycle, created in zip(cycle_data, cycles) for phase in cycle.get('phases', [])]
+    cycle_phases = CyclePhase.objects.bulk_create([
+        CyclePhase(
+            cycle=created,
+            phase=phase_objects.get(phase['phase']),
+            start_date=Date.fromisoformat(phase['start_date']),
+            end_date=Date.fromisoformat(phase['end_date']),
+        )
+        for created, phase in phase_data
+    ])
+
+    log_data = [(cycle_phase, log) for (_, phase), cycle_phase in zip(phase_data, cycle_phases) for log in phase.get('logs', [])]
+    cycle_logs = CycleLog.objects.bulk_create([
+        CycleLog(cycle_phase=cycle_phase, date=Date.fromisoformat(log['date']))
+        for cycle_phase, log in log_data
+    ])
+
+    symptom_names = {name for _, log in log_data for name in log.get('symptoms', [])}
+    symptoms = {symptom.symptom_name: symptom for symptom in Symptom.objects.filter(symptom_name__in=symptom_names)}
+    for name in symptom_names - set(symptoms):
+        symptoms[name] = Symptom.objects.create(symptom_name=name)
+    cycle_log_symptoms = CycleLogSymptom.objects.bulk_create([
+        CycleLogSymptom(cycle_log=cycle_log, symptom=symptoms[name])
+        for (_, log), cycle_log in zip(log_data, cycle_logs)
+        for name in log.get('symptoms', [])
+    ])
+
+    # Bulk inserts skip the signals that maintain the symptom rollups
+    if cycle_log_symptoms:
+        rebuild_symptom_rollups(user=user)
+
+    return {
+        "workouts": len(workouts),
+        "workout_exercises": len(workout_exercises),
+        "workout_logs": len(workout_logs),
+        "cycles": len(cycles),
+        "cycle_phases": len(cycle_phases),
+        "cycle_logs": len(cycle_logs),
+        "cycle_log_symptoms": len(cycle_log_symptoms),
+    }
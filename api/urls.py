@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import RegisterView, LoginView, UserDetailView, DeleteAccountView,  ChangePasswordView, LogoutView, WorkoutListCreateView, ExerciseListView, WorkoutDetailView, WorkoutLogView, CycleListView, PeriodDatesView, LogPeriodView, CurrentCycleView, DeleteWorkoutLogView
+from .views import RegisterView, LoginView, UserDetailView, DeleteAccountView,  ChangePasswordView, LogoutView, WorkoutListCreateView, ExerciseListView, ExerciseSearchView, WorkoutDetailView, WorkoutTemplateListView, WorkoutLogView, CycleListView, PeriodDatesView, LogPeriodView, CurrentCycleView, DeleteWorkoutLogView, SymptomAnalyticsView, CohortSymptomAnalyticsView, TrainingVolumeAnalyticsView, MetricsView, ExportView, ImportView, JobDetailView
 
 urlpatterns = [
     path('signup/', RegisterView.as_view(), name='signup'),
@@ -10,11 +10,20 @@ urlpatterns = [
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
     path('workouts/', WorkoutListCreateView.as_view(), name='workouts'),
     path('workouts/<int:workout_id>/', WorkoutDetailView.as_view(), name='workout_detail'),
+    path('workout-templates/', WorkoutTemplateListView.as_view(), name='workout_templates'),
     path('exercises/', ExerciseListView.as_view(), name='exercises'),
+    path('exercises/search/', ExerciseSearchView.as_view(), name='exercise_search'),
     path('workout-logs/', WorkoutLogView.as_view(), name='workout_logs'),
     path('workout-logs/<str:date>/', DeleteWorkoutLogView.as_view(), name='delete_workout_log'),
     path('cycles/', CycleListView.as_view(), name='cycles'),
     path('log-period/<str:date>/', LogPeriodView.as_view(), name='log_period'),
     path('period-dates/', PeriodDatesView.as_view(), name='period_dates'),
     path('cycle-data/', CurrentCycleView.as_view(), name='cycle_data'),  
+    path('analytics/symptoms/', SymptomAnalyticsView.as_view(), name='symptom_analytics'),
+    path('analytics/symptoms/cohort/', CohortSymptomAnalyticsView.as_view(), name='cohort_symptom_analytics'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('analytics/training-volume/', TrainingVolumeAnalyticsView.as_view(), name='training_volume_analytics'),
+    path('export/', ExportView.as_view(), name='export'),
+    path('import/', ImportView.as_view(), name='import'),
+    path('jobs/<uuid:job_id>/', JobDetailView.as_view(), name='job_detail'),
 ]
\ No newline at end of file
@@ -2,40 +2,116 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from .models import Workout, Exercise, WorkoutExercise, WorkoutLog, Phase, Cycle, CyclePhase, CycleLog, CycleLogSymptom, Symptom
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from .models import Workout, WorkoutTemplate, Exercise, WorkoutExercise, WorkoutLog, Phase, Cycle, CyclePhase, CycleLog, CycleLogSymptom, Symptom, SymptomRollup, IdempotencyKey, Job
+from .analytics import phase_training_volume, symptom_summary
+from .labels import LazyLabels
+from .compression import negotiate
+from .caching import get_catalogue_blob, get_template_payloads
+from .authentication import OptionalJWTAuthentication
+from .pagination import ExerciseSearchPagination, KeysetPagination
+from .renderers import MessagePackParser, MessagePackRenderer
+from .search import get_exercise_index
+from .shaping import shape_from_request
+from .metrics import registry
+from .tasks import enqueue
+from .throttling import LoginThrottle, LogPeriodThrottle, RegisterThrottle, UserTokenBucketThrottle
+from cyclesync.routers import has_recent_write, mark_recent_write, replica_configured, use_replica
 from .serializers import WorkoutSerializer, ExerciseSerializer, WorkoutLogSerializer, CycleSerializer, CyclePhaseSerializer, CycleLogSerializer
 from datetime import date as Date, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+# How long clients may reuse the exercise catalogue before revalidating it
+CATALOGUE_MAX_AGE = 60 * 60 * 24
+
+# How long a request's Idempotency-Key is remembered
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+class ReplicaRoutingMixin:
+    """
+    Serve safe requests from the read replica, and keep a user's reads on the primary for a
+    short while after any successful write through the view.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Unhandled exceptions skip finalize_response, and the worker thread serves the next request
+            if self._replica_token is not None:
+                use_replica.reset(self._replica_token)
+                self._replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replica_configured() and not has_recent_write(request.user.pk):
+            self._replica_token = use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and request.user.is_authenticated:
+            mark_recent_write(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class MessagePackMixin:
+    """Also answer in MessagePack (see api/renderers.py) to clients that ask for it, and accept it in request bodies"""
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # The body depends on the Accept header, so caches must keep the formats apart
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
 class RegisterView(APIView):
     permission_classes = [AllowAny] 
+    throttle_classes = [RegisterThrottle]
 
     def post(self, request):
         name = request.data.get('name')
         email = request.data.get('email')
         password = request.data.get('password')
 
-        if User.objects.filter(email=email).exists():
-            return Response({"error": "Email already exists"}, status=status.HTTP_400_BAD_REQUEST)
+        if not email:
+            return Response({"error": "Email is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Let the unique index on lower(email) reject duplicates instead of checking first
+        try:
+            User.objects.register(email=email, password=password, name=name)
+        except IntegrityError:
+            if User.objects.filter(email__iexact=email).exists():
+                return Response({"error": "Email already exists"}, status=status.HTTP_400_BAD_REQUEST)
+            raise
 
-        user = User.objects.create_user(email=email, password=password, name=name)
         return Response({"message": "User registered successfully"}, status=status.HTTP_201_CREATED)
 
 
 class LoginView(APIView):
     permission_classes = [AllowAny] 
+    throttle_classes = [LoginThrottle]
 
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
 
-        print(f"Email: {email}, Password: {password}")
+        logger.debug("Login attempt for %s", email)
 
         user = authenticate(email=email, password=password)
         if user is not None:
@@ -64,7 +140,7 @@ class LogoutView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
        
 
-class UserDetailView(APIView):
+class UserDetailView(ReplicaRoutingMixin, APIView):
     permission_classes = [IsAuthenticated] 
 
     def get(self, request):
@@ -92,8 +168,15 @@ class UserDetailView(APIView):
         ovulation_length = request.data.get('ovulation_length')
         luteal_length = request.data.get('luteal_length')
         
-        if email and User.objects.filter(email=email).exclude(id=user.id).exists():
-            return Response({"error": "Email already exists"}, status=status.HTTP_400_BAD_REQUEST)
+        lengths_changed = any(
+            value and int(value) != current
+            for value, current in [
+                (menstrual_length, user.menstrual_length),
+                (follicular_length, user.follicular_length),
+                (ovulation_length, user.ovulation_length),
+                (luteal_length, user.luteal_length),
+            ]
+        )
 
         user.name = name if name else user.name
         user.email = email if email else user.email
@@ -101,36 +184,22 @@ class UserDetailView(APIView):
         user.follicular_length = follicular_length if follicular_length else user.follicular_length
         user.ovulation_length = ovulation_length if ovulation_length else user.ovulation_length
         user.luteal_length = luteal_length if luteal_length else user.luteal_length
-        user.save()
-
-        # Update users current cycle phases and cycle length if there is a current cycle 
-        today = Date.today()
-        current_cycle = Cycle.objects.filter(user=user, start_date__lte=today).order_by('-start_date').first()
-
-        if current_cycle:
-            # Recalculate the phases for the current cycle
-            phases = [
-                ("Menstrual", user.menstrual_length),
-                ("Follicular", user.follicular_length),
-                ("Ovulatory", user.ovulation_length),
-                ("Luteal", user.luteal_length),
-            ]
 
-            start_date = current_cycle.start_date
-            total_cycle_length = 0
-
-            for phase_name, length in phases:
-                phase = current_cycle.phases.filter(phase__name=phase_name).first()
-                if phase:
-                    phase.start_date = start_date
-                    phase.end_date = start_date + timedelta(days=length - 1)
-                    phase.save()
-                    total_cycle_length += length
-                    start_date = phase.end_date + timedelta(days=1)
-            
-            # Update the cycle length
-            current_cycle.cycle_length = total_cycle_length
-            current_cycle.save()
+        # An email already used by another account is rejected by the unique index on lower(email)
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            if email and User.objects.filter(email__iexact=email).exclude(id=user.id).exists():
+                return Response({"error": "Email already exists"}, status=status.HTTP_400_BAD_REQUEST)
+            raise
+
+        # Update users current cycle phases and cycle length in the background, or every
+        # cycle when the client asks for "recompute_all_cycles"
+        if lengths_changed:
+            all_cycles = str(request.data.get('recompute_all_cycles', '')).lower() in ('1', 'true')
+            job = enqueue('recompute_cycles', user=user, user_id=user.pk, all_cycles=all_cycles)
+            return Response({"message": "User details updated successfully", "job_id": job.pk}, status=status.HTTP_202_ACCEPTED)
         
         return Response({"message": "User details updated successfully"}, status=status.HTTP_200_OK)
 
@@ -142,11 +211,14 @@ class DeleteAccountView(APIView):
         """Delete the logged in users account"""
         try : 
             user = request.user
-            user.delete()
-            print(f"User {user.email} deleted successfully")
-            return Response({"message": "Account deleted successfully"}, status=status.HTTP_200_OK)
+            # Deactivate first so the account cannot be used while its data is being deleted
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+            job = enqueue('delete_account', user=user, user_id=user.pk)
+            logger.info("User %s queued for deletion in job %s", user.pk, job.pk)
+            return Response({"message": "Account deletion started", "job_id": job.pk}, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
-            print(f"Error deleting user: {e}")
+            logger.exception("Error deleting user %s", request.user.pk)
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -166,30 +238,101 @@ class ChangePasswordView(APIView):
         return Response({"message": "Password changed successfully"}, status=status.HTTP_200_OK)
 
 
-class ExerciseListView(ListAPIView):
+class ExerciseListView(ReplicaRoutingMixin, ListAPIView):
     """API endpoint to retrieve a list of exercises."""
-    queryset = Exercise.objects.all()
+    queryset = Exercise.objects.order_by('id')
     serializer_class = ExerciseSerializer
     permission_classes = [IsAuthenticated] 
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return ExerciseSerializer.shape_queryset(super().get_queryset(), **shape_from_request(self.request))
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **shape_from_request(self.request), **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        """Serve the pre-encoded catalogue, letting clients revalidate with its ETag, or a page or selected fields of exercises"""
+        if self.paginator.is_requested(request) or 'fields' in request.query_params or 'expand' in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        blob = get_catalogue_blob()
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''), list(blob["encoded"]))
+        # Each encoding is a different body, so each gets its own strong ETag
+        etag = blob["etag"] if encoding is None else f'{blob["etag"][:-1]}-{encoding}"'
+
+        # If-None-Match uses the weak comparison: W/ prefixes are ignored
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in if_none_match or etag in (tag.removeprefix('W/') for tag in if_none_match):
+            response = HttpResponseNotModified()
+        elif encoding:
+            response = HttpResponse(blob["encoded"][encoding], content_type='application/json')
+            response['Content-Encoding'] = encoding
+        else:
+            response = HttpResponse(blob["body"], content_type='application/json')
+
+        response['ETag'] = etag
+        response['Cache-Control'] = f'private, max-age={CATALOGUE_MAX_AGE}'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class ExerciseSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Search the exercise catalogue by name, optionally filtered by exercise type id or name"""
+        query = request.query_params.get('q', '')
+        exercise_type = request.query_params.get('type')
+        if exercise_type and exercise_type.isdigit():
+            exercise_type = int(exercise_type)
+
+        matches = get_exercise_index().search(query, exercise_type=exercise_type or None)
+
+        paginator = ExerciseSearchPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        results = [
+            {
+                "id": exercise_id,
+                "name": name,
+                "exercise_type": {"id": type_id, "name": type_name},
+            }
+            for exercise_id, name, type_id, type_name in page
+        ]
+        return paginator.get_paginated_response(results)
 
 
 class WorkoutListCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Retrieve all workouts for the authenticated user"""
-        workouts = Workout.objects.filter(user=request.user)
-        serializer = WorkoutSerializer(workouts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Retrieve all workouts for the authenticated user, or a page of them with ?cursor= or ?page_size="""
+        shape = shape_from_request(request)
+        workouts = WorkoutSerializer.shape_queryset(Workout.objects.filter(user=request.user), **shape).order_by('id')
+        paginator = KeysetPagination(ordering='id')
+        page = paginator.paginate_queryset(workouts, request, view=self)
+        serializer = WorkoutSerializer(workouts if page is None else page, many=True, **shape)
+        return paginator.get_list_response(serializer.data)
     
     def post(self, request):
         """Create a new workout for the authenticated user"""
         data = request.data
         workout_name = data.get('name')
         exercises = data.get('exercises', [])
+        template_id = data.get('template')
         
         if not workout_name:
             return Response({"error": "Workout name is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if template_id:
+            # Reference the shared template instead of copying its exercises
+            try:
+                template = WorkoutTemplate.objects.get(id=template_id)
+            except WorkoutTemplate.DoesNotExist:
+                return Response({"error": "Workout template not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            Workout.objects.create(user=request.user, name=workout_name, template=template)
+            return Response({"message": "Workout created successfully"}, status=status.HTTP_201_CREATED)
         
         workout = Workout.objects.create(user=request.user, name=workout_name)
 
@@ -206,6 +349,15 @@ class WorkoutListCreateView(APIView):
         return Response({"message": "Workout created successfully"}, status=status.HTTP_201_CREATED)
     
 
+class WorkoutTemplateListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Retrieve all shared workout templates"""
+        template_ids = list(WorkoutTemplate.objects.order_by('name').values_list('id', flat=True))
+        return Response(get_template_payloads(template_ids), status=status.HTTP_200_OK)
+
+
 class WorkoutDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -215,7 +367,7 @@ class WorkoutDetailView(APIView):
             workout = Workout.objects.get(id=workout_id, user=request.user)
             serializer = WorkoutSerializer(workout)
             workout_data = serializer.data
-            print(workout_data)  # Debugging line to check the serialized data
+            logger.debug("Serialized workout %s: %s", workout_id, workout_data)
 
             # Get current cycle and phase
             today = Date.today()
@@ -247,8 +399,16 @@ class WorkoutDetailView(APIView):
         try:
             workout = Workout.objects.get(id=workout_id, user=request.user)
             data = request.data
-            print(f"Updating workout with ID {workout_id} with data: {data}")  # Debugging line
+            logger.debug("Updating workout %s with data: %s", workout_id, data)
             workout.name = data.get('name', workout.name)
+
+            if workout.template_id and 'workout_exercises' not in data:
+                # Renaming keeps sharing the template's exercises
+                workout.save()
+                return Response({"message": "Workout updated successfully"}, status=status.HTTP_200_OK)
+
+            # Editing the exercises gives the workout its own copy
+            workout.template = None
             workout.save()
 
             # Update workout exercises
@@ -256,9 +416,7 @@ class WorkoutDetailView(APIView):
             workout.workout_exercises.all().delete()  # Clear existing exercises
 
             for exercise in exercises:
-                print(f"Exercise data: {exercise}")
                 exerciseObject = Exercise.objects.get(id=exercise['exerciseId'])
-                print("exercise object:", exerciseObject)
                 WorkoutExercise.objects.create(
                     workout=workout,
                     exercise=exerciseObject,
@@ -283,14 +441,17 @@ class WorkoutDetailView(APIView):
             return Response({"error": "Workout not found"}, status=status.HTTP_404_NOT_FOUND)
         
 
-class WorkoutLogView(APIView):
+class WorkoutLogView(MessagePackMixin, ReplicaRoutingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Retrieve all workout logs for the authenticated user"""
-        workout_logs = WorkoutLog.objects.filter(user=request.user)
-        serializer = WorkoutLogSerializer(workout_logs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Retrieve all workout logs for the authenticated user, or a page of them with ?cursor= or ?page_size="""
+        shape = shape_from_request(request)
+        workout_logs = WorkoutLogSerializer.shape_queryset(WorkoutLog.objects.filter(user=request.user), required=('date',), **shape).order_by('date')
+        paginator = KeysetPagination(ordering='date')
+        page = paginator.paginate_queryset(workout_logs, request, view=self)
+        serializer = WorkoutLogSerializer(workout_logs if page is None else page, many=True, **shape)
+        return paginator.get_list_response(serializer.data)
     
     def post(self, request):
         """Log a workout for a specific date"""
@@ -327,12 +488,12 @@ class WorkoutLogView(APIView):
             return Response({"error": "Workout log not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class DeleteWorkoutLogView(APIView):
+class DeleteWorkoutLogView(ReplicaRoutingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, date):
         """Delete a specific workout log for the authenticated user"""
-        print(f"Attempting to delete workout log for date: {date}")
+        logger.debug("Deleting workout log for date %s", date)
 
         date_str = date
         
@@ -346,11 +507,9 @@ class DeleteWorkoutLogView(APIView):
             return Response({"error": "Invalid date format. use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            print(f"Now Attempting to delete workout log for date: {date_obj}")
             workout_log = WorkoutLog.objects.get(user=request.user, date=date_obj)
-            print(f"WorkoutLog found for date: {date_obj}")
+            logger.debug("Deleting %s", LazyLabels([workout_log]))
             workout_log.delete()
-            print(f"Successfully Deleted WorkoutLog for date: {date_obj}")
             return Response({"message": "Workout log deleted successfully"}, status=status.HTTP_200_OK)
         except WorkoutLog.DoesNotExist:
             return Response({"error": "Workout log not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -358,21 +517,24 @@ class DeleteWorkoutLogView(APIView):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class PeriodDatesView(APIView):
+class PeriodDatesView(MessagePackMixin, ReplicaRoutingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Retrieve all period dates for the user"""
+        """Retrieve all period dates for the user, or a page of them with ?cursor= or ?page_size="""
         try:
-            logs = CycleLog.objects.filter(cycle_phase__cycle__user=request.user, cycle_phase__phase__name="Menstrual")
-            dates = logs.values_list('date', flat=True)
-            return Response({"period_dates": dates}, status=status.HTTP_200_OK)
+            logs = CycleLog.objects.filter(cycle_phase__cycle__user=request.user, cycle_phase__phase__name="Menstrual").order_by('date')
+            paginator = KeysetPagination(ordering='date')
+            page = paginator.paginate_queryset(logs.values('date'), request, view=self)
+            dates = list(logs.values_list('date', flat=True)) if page is None else [log['date'] for log in page]
+            return paginator.get_list_response(dates, key="period_dates")
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
 
-class LogPeriodView(APIView):
+class LogPeriodView(ReplicaRoutingMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserTokenBucketThrottle, LogPeriodThrottle]
 
     def post(self, request, date):
         """Log a period for the authenticated user"""
@@ -388,7 +550,32 @@ class LogPeriodView(APIView):
         except ValueError:
             return Response({"error": "Invalid date format. use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
-        
+        idempotency_key = request.headers.get('Idempotency-Key')
+
+        # Lock the user row so concurrent requests for the same user log one period after another
+        try:
+            with transaction.atomic():
+                User.objects.select_for_update().filter(pk=user.pk).first()
+
+                if idempotency_key:
+                    # Replay the stored response for a retried request
+                    IdempotencyKey.objects.filter(user=user, created_at__lt=timezone.now() - IDEMPOTENCY_KEY_TTL).delete()
+                    previous = IdempotencyKey.objects.filter(user=user, key=idempotency_key).first()
+                    if previous:
+                        return Response(previous.response_body, status=previous.response_status)
+
+                response_body, response_status = self._log_period(user, date_obj)
+
+                if idempotency_key:
+                    IdempotencyKey.objects.create(user=user, key=idempotency_key, response_status=response_status, response_body=response_body)
+        except IntegrityError:
+            # Databases without row locks (SQLite) can still race; the unique constraints let only one request win
+            return Response({"message": "Period already logged"}, status=status.HTTP_200_OK)
+
+        return Response(response_body, status=response_status)
+
+    def _log_period(self, user, date_obj):
+        """Log the period within the caller's transaction, returning the response body and status"""
         # check if the user has an existing cycle that includes this date
         current_cycle = Cycle.objects.filter(user=user, start_date__lte=date_obj).order_by('-start_date').first()
 
@@ -396,39 +583,37 @@ class LogPeriodView(APIView):
             # Existing cycle: Create a CycleLog for the Menstrual Phase
             menstrual_phase = current_cycle.phases.filter(phase__name='Menstrual').first()
             if not menstrual_phase:
-                return Response({"error": "No Menstrual phase found for the current cycle"}, status=status.HTTP_400_BAD_REQUEST)
+                return {"error": "No Menstrual phase found for the current cycle"}, status.HTTP_400_BAD_REQUEST
             
-            CycleLog.objects.create(cycle_phase=menstrual_phase, date=date_obj)
-            return Response({"message": "Period logged successfully"}, status=status.HTTP_201_CREATED)
+            _, created = CycleLog.objects.get_or_create(cycle_phase=menstrual_phase, date=date_obj)
+            if not created:
+                return {"message": "Period already logged"}, status.HTTP_200_OK
+            return {"message": "Period logged successfully"}, status.HTTP_201_CREATED
         
         # No existing cycle: Create a new cycle and cyclephases
         cycle = Cycle.objects.create(user=user, start_date = date_obj)
 
         # set the cycle length based on the user cycle length variables
-        menstrual_length = user.menstrual_length
-        follicular_length = user.follicular_length
-        ovulation_length = user.ovulation_length
-        luteal_length = user.luteal_length
-
         phases = [
-            ("Menstrual", menstrual_length),
-            ("Follicular", follicular_length),
-            ("Ovulatory", ovulation_length),
-            ("Luteal", luteal_length),
+            ("Menstrual", user.menstrual_length),
+            ("Follicular", user.follicular_length),
+            ("Ovulatory", user.ovulation_length),
+            ("Luteal", user.luteal_length),
         ]   
+        phase_objects = {phase.name: phase for phase in Phase.objects.filter(name__in=[name for name, _ in phases])}
 
+        cycle_phases = []
         start_date = date_obj
         for phase_name, length in phases:
             end_date = start_date + timedelta(days=length - 1)
-            phase = Phase.objects.get(name=phase_name)
-            CyclePhase.objects.create(cycle=cycle, phase=phase, start_date=start_date, end_date=end_date)
+            cycle_phases.append(CyclePhase(cycle=cycle, phase=phase_objects[phase_name], start_date=start_date, end_date=end_date))
             start_date = end_date + timedelta(days=1)
+        CyclePhase.objects.bulk_create(cycle_phases)
     
         # Create a CycleLog for the Menstrual Phase
-        menstrual_phase = cycle.phases.filter(phase__name='Menstrual').first()
-        CycleLog.objects.create(cycle_phase=menstrual_phase, date=date_obj)
+        CycleLog.objects.create(cycle_phase=cycle_phases[0], date=date_obj)
 
-        return Response({"message": "New cycle created and period logged successfully"}, status=status.HTTP_201_CREATED)
+        return {"message": "New cycle created and period logged successfully"}, status.HTTP_201_CREATED
 
     def delete(self, request, date):
         """Delete a period log for the user"""
@@ -444,34 +629,31 @@ class LogPeriodView(APIView):
         except ValueError:
             return Response({"error": "Invalid date format. use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
         
-        print(f"Now Attempting to delete period log for date: {date_obj}")
+        logger.debug("Deleting period log for date %s", date_obj)
 
         try:
             # Find the CycleLog for the given date and delete it
             log = CycleLog.objects.get(cycle_phase__cycle__user=user, date=date_obj)
             cycle = log.cycle_phase.cycle
+            logger.debug("Deleting %s", LazyLabels([log]))
 
-            print(f"CycleLog found for date: {date_obj}")
-            
             if cycle.start_date == date_obj:
                 # If CycleLog's date matches start date of the cycle, delete Cycle & associated CyclePhases
                 cycle.delete()
                 return Response({"message": "Cycle and period log deleted successfully"}, status=status.HTTP_200_OK)
             else:
                 # If it's not the start date, just delete the CycleLog
-                print(f"Deleting CycleLog for date: {date_obj}")
                 log.delete()
-                print(f"Successfully Deleted CycleLog for date: {date_obj}")
                 return Response({"message": "Period log deleted successfully"}, status=status.HTTP_200_OK)
         except CycleLog.DoesNotExist:
             return Response({"error": "Period log not found"}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
+        except Exception:
             # Catch any other unexpected errors
-            print(f"Unexpected error while deleting period log: {e}")
+            logger.exception("Unexpected error while deleting period log for date %s", date_obj)
             return Response({"error": "An unexpected error occurred while deleting the period log."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class CurrentCycleView(APIView):
+class CurrentCycleView(ReplicaRoutingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -493,7 +675,6 @@ class CurrentCycleView(APIView):
         
         # Get cycle length
         cycle_length = current_cycle.cycle_length
-        print(f"Cycle Length: {cycle_length}")
 
         # Calculate cycle day
         cycle_day = (today - current_cycle.start_date).days + 1
@@ -534,14 +715,18 @@ class CurrentCycleView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class CycleListView(APIView):
+class CycleListView(ReplicaRoutingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        """Retrieve all cycles for the user"""
-        cycles = Cycle.objects.filter(user=request.user).order_by('-start_date')  # order by the most recent cycles
-        serializer = CycleSerializer(cycles, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Retrieve all cycles for the user, or a page of them with ?cursor= or ?page_size="""
+        shape = shape_from_request(request)
+        cycles = CycleSerializer.shape_queryset(Cycle.objects.filter(user=request.user), required=('start_date',), **shape)
+        cycles = cycles.order_by('-start_date')  # order by the most recent cycles
+        paginator = KeysetPagination(ordering='-start_date')
+        page = paginator.paginate_queryset(cycles, request, view=self)
+        serializer = CycleSerializer(cycles if page is None else page, many=True, **shape)
+        return paginator.get_list_response(serializer.data)
 
 
 class CyclePhaseListView(APIView):
@@ -559,3 +744,103 @@ class CyclePhaseListView(APIView):
         
 
         
+
+
+class SymptomAnalyticsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Retrieve symptom frequency by phase and cycle day for the user"""
+        rollups = SymptomRollup.objects.filter(user=request.user)
+        return Response(symptom_summary(rollups), status=status.HTTP_200_OK)
+
+
+class CohortSymptomAnalyticsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Retrieve symptom frequency by phase and cycle day across all users"""
+        return Response(symptom_summary(SymptomRollup.objects.all()), status=status.HTTP_200_OK)
+
+
+class TrainingVolumeAnalyticsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Retrieve workout frequency and training volume per cycle phase over a date range"""
+        try:
+            # Default to the last year of workouts if no range is given
+            end_date = Date.fromisoformat(request.query_params['end']) if 'end' in request.query_params else Date.today()
+            start_date = Date.fromisoformat(request.query_params['start']) if 'start' in request.query_params else end_date - timedelta(days=365)
+        except ValueError:
+            return Response({"error": "Invalid date format. use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start_date > end_date:
+            return Response({"error": "Start date must be before end date"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "start": start_date,
+            "end": end_date,
+            "phases": phase_training_volume(request.user, start_date, end_date),
+        }, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Retrieve this worker's aggregated request timing histograms"""
+        return Response(registry.snapshot(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        """Reset this worker's aggregated request timing histograms"""
+        registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Start exporting the logged in users cycles and workouts"""
+        job = enqueue('export_user_data', user=request.user, user_id=request.user.pk)
+        return Response({"message": "Export started", "job_id": job.pk}, status=status.HTTP_202_ACCEPTED)
+
+
+class ImportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Start importing previously exported cycles and workouts into the logged in users account"""
+        data = request.data
+        if not isinstance(data, dict) or data.get('version') != 1:
+            return Response({"error": "Expected data from an export with version 1"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = enqueue('import_user_data', user=request.user, user_id=request.user.pk, data=data)
+        return Response({"message": "Import started", "job_id": job.pk}, status=status.HTTP_202_ACCEPTED)
+
+
+class JobDetailView(APIView):
+    # Job ids are unguessable; anyone holding one can see its status, only the owner its result
+    authentication_classes = [OptionalJWTAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request, job_id):
+        """Retrieve the status of a background job"""
+        try:
+            job = Job.objects.get(pk=job_id)
+        except Job.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        job_data = {
+            "id": job.pk,
+            "name": job.name,
+            "status": job.status,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+        if request.user.is_authenticated and job.user_id == request.user.pk:
+            job_data["result"] = job.result
+            job_data["error"] = job.error
+        return Response(job_data, status=status.HTTP_200_OK)
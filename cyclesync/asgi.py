@@ -10,7 +10,11 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from .preload import warm_up
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cyclesync.settings')
 
 application = get_asgi_application()
+
+# Load the URLconf and views before the first request (see cyclesync/preload.py)
+warm_up()
@@ -0,0 +1,66 @@
+"""
+Database connection settings built from the environment.
+
+By default connections are kept open between requests (CONN_MAX_AGE) and checked before
+reuse. Setting DB_POOL=true on PostgreSQL switches to a psycopg 3 connection pool per worker
+instead (requires `psycopg[pool]`), sized so every thread of a worker can hold a connection
+without the workers together exceeding DB_MAX_CONNECTIONS.
+"""
+
+import os
+import dj_database_url
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def pool_options(workers, threads, max_connections):
+    """Return psycopg pool options for one worker process"""
+    # Each thread needs at most one connection; never let all workers together exceed the server limit
+    max_size = max(1, min(threads, max_connections // max(workers, 1)))
+    return {
+        'min_size': min(_env_int('DB_POOL_MIN_SIZE', 1), max_size),
+        'max_size': _env_int('DB_POOL_MAX_SIZE', max_size),
+        'timeout': _env_int('DB_POOL_TIMEOUT', 10),
+    }
+
+
+def database_config():
+    """Return the `default` DATABASES entry for the current environment"""
+    pooled = _env_bool('DB_POOL')
+    config = dj_database_url.config(
+        default=os.environ.get('DATABASE_URL'),
+        # Django's pool manages connection lifetime itself and requires CONN_MAX_AGE=0
+        conn_max_age=0 if pooled else _env_int('DB_CONN_MAX_AGE', 600),
+        conn_health_checks=not pooled,
+    )
+
+    if pooled and config.get('ENGINE') == 'django.db.backends.postgresql':
+        config.setdefault('OPTIONS', {})['pool'] = pool_options(
+            workers=_env_int('WEB_CONCURRENCY', 1),
+            threads=_env_int('GUNICORN_THREADS', 1),
+            max_connections=_env_int('DB_MAX_CONNECTIONS', 100),
+        )
+
+    return config
+
+
+def replica_config():
+    """Return the `replica` DATABASES entry, or None when DATABASE_REPLICA_URL is not set"""
+    url = os.environ.get('DATABASE_REPLICA_URL')
+    if not url:
+        return None
+
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=_env_int('DB_CONN_MAX_AGE', 600),
+        conn_health_checks=True,
+    )
+    # Tests read back what they wrote, so point the replica at the test primary
+    config['TEST'] = {'MIRROR': 'default'}
+    return config
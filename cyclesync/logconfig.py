@@ -0,0 +1,76 @@
+"""
+Logging handlers used by the LOGGING setting.
+
+Request threads only merge the message arguments and render any traceback before putting
+records on an in-memory queue; a background listener thread does the formatting and writing,
+so slow stdout under gunicorn never blocks a request.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class QueueListenerHandler(QueueHandler):
+    """Queue handler that owns a listener thread forwarding records to the given handlers"""
+
+    def __init__(self, handlers, respect_handler_level=True):
+        super().__init__(queue.SimpleQueue())
+        # Resolve `cfg://handlers.<name>` references from the LOGGING dict
+        self.target_handlers = [handlers[i] for i in range(len(handlers))]
+        self.respect_handler_level = respect_handler_level
+        self._start_listener()
+        atexit.register(self._stop_listener)
+        # A listener thread started before gunicorn forks does not exist in the workers
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def prepare(self, record):
+        """
+        Unlike QueueHandler.prepare, leave the formatting to the listener's handlers and keep
+        exc_info, so formatters still see the exception. Arguments and the traceback are
+        rendered now, as they may change or go away once the request moves on.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+        return record
+
+    def _start_listener(self):
+        self.listener = QueueListener(self.queue, *self.target_handlers, respect_handler_level=self.respect_handler_level)
+        self.listener.start()
+
+    def _stop_listener(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _restart_after_fork(self):
+        self.queue = queue.SimpleQueue()
+        self._start_listener()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any `request_metrics` extra"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if hasattr(record, 'request_metrics'):
+            entry["metrics"] = record.request_metrics
+        if record.exc_info:
+            # Records from QueueListenerHandler come with the traceback already rendered
+            entry["exception"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
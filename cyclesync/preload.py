@@ -0,0 +1,53 @@
+"""
+Getting a worker ready before it accepts requests.
+
+Django imports the URLconf, views, serializers and DRF's settings classes on the first request.
+warm_up() does that when the WSGI/ASGI application is loaded instead, so the first request a
+worker serves is as fast as the rest. With `gunicorn --preload` the application is loaded once
+in the master and the workers are forked from it, sharing the imported modules copy-on-write.
+
+Nothing holding a socket or a thread may cross the fork: database connections are closed in the
+master before forking, and the throttle store and thread pools are recreated in each worker
+(see the os.register_at_fork calls next to them).
+"""
+
+import gc
+import os
+from importlib import import_module
+from django.db import connections
+from django.urls import Resolver404, get_resolver
+
+_warmed_up = False
+
+
+def warm_up():
+    """Import what the first request would otherwise import, and make this process safe to fork"""
+    global _warmed_up
+    if _warmed_up:
+        return
+    _warmed_up = True
+
+    # Resolving a path that matches nothing imports the URLconf and every view it routes to,
+    # and compiles each pattern's regex
+    try:
+        get_resolver().resolve('/')
+    except Resolver404:
+        pass
+    # simplejwt builds its token backend, importing PyJWT, on the first authenticated request
+    import_module('rest_framework_simplejwt.state')
+
+    os.register_at_fork(before=_before_fork)
+
+
+def _before_fork():
+    # A connection opened in the master would be shared by every worker's queries
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+    # Pool threads do not survive the fork, so each worker opens its own pool. `connection.pool`
+    # would create a pool that does not exist yet, hence the look at the backend's pool registry.
+    for connection in connections.all():
+        if connection.alias in getattr(connection, '_connection_pools', {}):
+            connection.close_pool()
+    # Preloaded objects never become garbage; keeping them out of collections stops the workers'
+    # collector from writing to (and so copying) the pages they share with the master
+    gc.freeze()
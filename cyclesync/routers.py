@@ -0,0 +1,51 @@
+"""
+Routing of reads to the read replica.
+
+Views opt in with api.views.ReplicaRoutingMixin, which routes their safe requests to the
+`replica` database unless the user wrote within the last REPLICA_STICKY_SECONDS, so users
+always read their own writes even when the replica lags. Those recent writes are kept in the
+default cache, which settings.py requires to be shared by all workers when a replica is set.
+"""
+
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_ALIAS = 'replica'
+
+# Set while a view that may read from the replica handles a safe request
+use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _sticky_key(user_id):
+    return f"replica_sticky:{user_id}"
+
+
+def mark_recent_write(user_id):
+    """Pin the user's reads to the primary for a short while after a write"""
+    cache.set(_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def has_recent_write(user_id):
+    return cache.get(_sticky_key(user_id), False)
+
+
+class ReplicaRouter:
+    """Send reads to the replica when the current request allows it, everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        # The database cache holds the recent writes and invalidated payloads, so it is never read from the replica
+        if model._meta.app_label == 'django_cache':
+            return 'default'
+        return REPLICA_ALIAS if use_replica.get() else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
@@ -11,18 +11,21 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
-from dotenv import load_dotenv
 import os
 
 from pathlib import Path
 from datetime import timedelta
-import dj_database_url
-
-load_dotenv()
+from .database import database_config, replica_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Local development reads variables from .env; deployments set them in the environment, so
+# workers there skip importing python-dotenv and searching the directory tree for the file
+if (BASE_DIR / '.env').is_file():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -55,8 +58,24 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserTokenBucketThrottle',
+    ],
+    # Token bucket sizes: "N/period" allows bursts of N requests, refilling N per period
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('THROTTLE_RATE_USER', '600/min'),
+        'login': os.environ.get('THROTTLE_RATE_LOGIN', '10/min'),
+        'register': os.environ.get('THROTTLE_RATE_REGISTER', '5/hour'),
+        'log_period': os.environ.get('THROTTLE_RATE_LOG_PERIOD', '30/min'),
+    },
 }
 
+# Where throttle buckets are kept: 'shared_memory' is shared by the workers on one host,
+# 'cache' uses the default cache and should be used when running on several hosts
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'shared_memory')
+
+THROTTLE_SHARED_MEMORY_PATH = os.environ.get('THROTTLE_SHARED_MEMORY_PATH')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -99,6 +118,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -110,6 +131,20 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Share of requests (0 to 1) timed by RequestMetricsMiddleware; 0 removes it from the stack
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '0'))
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Levels for per-request compression: low enough to cost well under a millisecond on typical
+# JSON responses. The cached exercise catalogue is compressed once at the maximum levels.
+COMPRESSION_LEVELS = {
+    'br': int(os.environ.get('COMPRESSION_LEVEL_BR', '4')),
+    'zstd': int(os.environ.get('COMPRESSION_LEVEL_ZSTD', '3')),
+    'gzip': int(os.environ.get('COMPRESSION_LEVEL_GZIP', '6')),
+}
+
 ROOT_URLCONF = 'cyclesync.urls'
 
 TEMPLATES = [
@@ -134,12 +169,122 @@ WSGI_APPLICATION = 'cyclesync.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Persistent connections with health checks, or a psycopg pool with DB_POOL=true (see cyclesync/database.py)
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL')
-    )
+    'default': database_config()
 }
 
+# Optional read replica for the read-only endpoints. It needs a shared cache (see CACHES below).
+# To try it locally with SQLite, migrate the primary, run `python manage.py createcachetable`,
+# copy the database (e.g. `cp db.sqlite3 replica.sqlite3`) and set
+# DATABASE_REPLICA_URL=sqlite:///replica.sqlite3, CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache
+# and CACHE_LOCATION=cyclesync_cache
+
+REPLICA_DATABASE = replica_config()
+
+if REPLICA_DATABASE:
+    DATABASES['replica'] = REPLICA_DATABASE
+    DATABASE_ROUTERS = ['cyclesync.routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '10'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Cached payloads (exercise catalogue, workout templates) are invalidated by signals in the
+# process that made the change, so multi-worker deployments should point this at a shared
+# backend, e.g. CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache and
+# CACHE_LOCATION=cyclesync_cache after running `python manage.py createcachetable`.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'cyclesync'),
+    }
+}
+
+# With a read replica the cache also remembers which users just wrote, so their next reads go to
+# the primary (cyclesync/routers.py). Every worker has to see those marks, which a per-process
+# cache does not do: use the database, file or Redis cache whenever DATABASE_REPLICA_URL is set.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+if REPLICA_DATABASE and CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+    raise ValueError("DATABASE_REPLICA_URL needs a cache shared by all workers. Please set CACHE_BACKEND, e.g. to django.core.cache.backends.db.DatabaseCache.")
+
+
+# Background tasks
+# 'thread' runs jobs on an in-process thread pool after the request commits. 'database' leaves
+# them queued for `python manage.py run_worker`, and must only be set where that process runs.
+
+TASK_BACKEND = os.environ.get('TASK_BACKEND', 'thread')
+
+TASK_THREADS = int(os.environ.get('TASK_THREADS', '2'))
+
+# A job still running after this many seconds is assumed to have lost its worker and is queued
+# again, until it has been started TASK_MAX_ATTEMPTS times
+
+TASK_STALE_AFTER = int(os.environ.get('TASK_STALE_AFTER', '600'))
+
+TASK_MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', '3'))
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.1/topics/logging/
+# Records are handed to a queue and written by a background thread so request threads never
+# block on stdout. Levels can be tuned per module, e.g. API_VIEWS_LOG_LEVEL=DEBUG.
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'text': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+        'json': {
+            '()': 'cyclesync.logconfig.JsonFormatter',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': os.environ.get('LOG_FORMAT', 'text'),
+        },
+        'queue': {
+            '()': 'cyclesync.logconfig.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['queue'],
+            'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'api': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'api.views': {
+            'level': os.environ.get('API_VIEWS_LOG_LEVEL', LOG_LEVEL),
+        },
+        'api.middleware': {
+            'level': os.environ.get('API_METRICS_LOG_LEVEL', LOG_LEVEL),
+        },
+    },
+}
 
 
 # Password validation
@@ -179,6 +324,12 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Assets the admin and browsable API never load are left out (see cyclesync/staticfiles.py)
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'cyclesync.staticfiles.AppDirectoriesFinder',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -187,6 +338,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # Static files (CSS, JavaScript, Images)
+# collectstatic writes content-hashed copies with Brotli (.br) and gzip (.gz) versions next to
+# them; WhiteNoise serves the smallest one the client accepts, cached as immutable for a year.
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Only the hashed copies are referenced once the manifest is in use
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
 
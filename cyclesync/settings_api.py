@@ -0,0 +1,55 @@
+"""
+Settings for nodes that only serve the JSON API.
+
+The API authenticates with JWTs alone, so sessions, messages, CSRF, clickjacking protection,
+the admin and static files are dropped from the request path and the app registry. Run API
+nodes with DJANGO_SETTINGS_MODULE=cyclesync.settings_api and serve the admin (and run
+migrations) from nodes using the full cyclesync.settings profile.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, TEMPLATES
+
+ADMIN_ONLY_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'rest_framework.authtoken',
+]
+
+ADMIN_ONLY_MIDDLEWARE = [
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_ONLY_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in ADMIN_ONLY_MIDDLEWARE]
+
+ROOT_URLCONF = 'cyclesync.urls_api'
+
+# No browsable API: it needs templates, static files and session login
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
+
+# The API uses no CSRF tokens; Django's error views still ask for one, which must not need sessions
+CSRF_USE_SESSIONS = False
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'OPTIONS': {
+            'context_processors': [
+                processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+                if processor != 'django.contrib.messages.context_processors.messages'
+            ],
+        },
+    },
+]
@@ -0,0 +1,48 @@
+"""
+Static files finder that leaves out assets this project never serves.
+
+The API's only HTML pages are the Django admin (in English, without GIS or right-to-left
+layouts) and DRF's browsable API (without the schema docs). With DEBUG off the admin loads
+minified vendor scripts only. Nothing below is referenced by those pages, so collectstatic
+does not copy, hash or compress it.
+"""
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.utils import matches_patterns
+
+UNUSED_STATIC_PATTERNS = [
+    # DRF schema docs, and the font-awesome/coreapi/theme files only they use
+    'rest_framework/docs/*',
+    'rest_framework/css/font-awesome-*.css',
+    'rest_framework/fonts/fontawesome-webfont.*',
+    'rest_framework/js/coreapi-*.js',
+    'rest_framework/css/bootstrap-theme.min.css*',
+    # Unminified vendor builds, loaded by the admin only with DEBUG on
+    'admin/js/vendor/jquery/jquery.js',
+    'admin/js/vendor/select2/select2.full.js',
+    'admin/js/vendor/xregexp/xregexp.js',
+    # Admin GIS widgets and right-to-left stylesheets
+    'admin/img/gis/*',
+    'admin/css/rtl.css',
+    'admin/css/responsive_rtl.css',
+]
+
+# Select2 translations are loaded for the active language only
+SELECT2_I18N_PATTERN = 'admin/js/vendor/select2/i18n/*'
+SELECT2_LANGUAGES = ['en.js']
+
+
+def is_unused(path):
+    """Whether a static file path is one this project never serves"""
+    if matches_patterns(path, [SELECT2_I18N_PATTERN]):
+        return path.rsplit('/', 1)[-1] not in SELECT2_LANGUAGES
+    return matches_patterns(path, UNUSED_STATIC_PATTERNS)
+
+
+class AppDirectoriesFinder(finders.AppDirectoriesFinder):
+    """App static files finder that skips unused assets when collecting"""
+
+    def list(self, ignore_patterns):
+        for path, storage in super().list(ignore_patterns):
+            if not is_unused(path):
+                yield path, storage
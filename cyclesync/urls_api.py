@@ -0,0 +1,6 @@
+from django.urls import path, include
+
+# URLconf for API-only nodes (cyclesync.settings_api); the admin is served by the full profile
+urlpatterns = [
+    path('api/', include('api.urls')),
+]
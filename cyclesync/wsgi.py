@@ -10,7 +10,11 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from .preload import warm_up
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cyclesync.settings')
 
 application = get_wsgi_application()
+
+# Load the URLconf and views now instead of on the first request (see cyclesync/preload.py)
+warm_up()
@@ -0,0 +1,138 @@
+"""
+Gunicorn configuration, read automatically when gunicorn is started from the repository root:
+
+    gunicorn
+
+Worker and thread counts are sized from the CPUs and memory the container may use (cgroup
+limits included), and every value can be overridden from the environment:
+
+    WEB_WORKER_CLASS              gthread (default), sync or uvicorn (needs `uvicorn-worker`)
+    WEB_CONCURRENCY               worker processes
+    GUNICORN_THREADS              threads per gthread worker
+    WEB_WORKER_MEMORY_MB          memory to budget per worker when sizing (default 150)
+    GUNICORN_PRELOAD              load the app once before forking workers (default false)
+    GUNICORN_MAX_REQUESTS         requests before a worker is replaced (default 1000, 0 = never)
+    GUNICORN_MAX_REQUESTS_JITTER  random extra requests so workers are not all replaced at once
+    GUNICORN_KEEPALIVE            seconds an idle keep-alive connection stays open (default 5)
+    GUNICORN_TIMEOUT              seconds before a silent worker is killed (default 30)
+
+The counts chosen here are exported as WEB_CONCURRENCY and GUNICORN_THREADS so the database
+pool sizing in cyclesync/database.py sees them.
+"""
+
+import importlib.util
+import math
+import os
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+}
+
+# Share of the container's memory the workers may be sized to use
+MEMORY_HEADROOM = 0.75
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().split()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """Number of CPUs this process may use, honouring a cgroup CPU quota"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+    quota = _read('/sys/fs/cgroup/cpu.max')
+    if quota and quota[0] != 'max':
+        cpus = min(cpus, math.ceil(int(quota[0]) / int(quota[1])))
+    else:
+        quota, period = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if quota and period and int(quota[0]) > 0:
+            cpus = min(cpus, math.ceil(int(quota[0]) / int(period[0])))
+    return max(1, cpus)
+
+
+def memory_limit():
+    """Bytes of memory this process may use, honouring a cgroup memory limit"""
+    physical = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        limit = _read(path)
+        if limit and limit[0] != 'max':
+            # cgroup v1 reports "no limit" as a number larger than the machine's memory
+            return min(physical, int(limit[0]))
+    return physical
+
+
+def worker_sizing(kind, cpus, memory):
+    """Return (workers, threads) for a worker class on a machine with `cpus` and `memory` bytes"""
+    if kind == 'sync':
+        # One request at a time per process; extra processes cover time spent waiting on the database
+        workers, threads = 2 * cpus + 1, 1
+    elif kind == 'gthread':
+        workers, threads = cpus + 1, 4
+    else:
+        # The event loop handles concurrency; Django runs sync views on its own thread pool
+        workers, threads = cpus, 1
+
+    worker_memory = _env_int('WEB_WORKER_MEMORY_MB', 150) * 1024 * 1024
+    workers = min(workers, int(memory * MEMORY_HEADROOM) // worker_memory)
+
+    # Every thread can hold a database connection; stay under the server's connection limit
+    workers = min(workers, _env_int('DB_MAX_CONNECTIONS', 100) // threads)
+    return max(1, workers), threads
+
+
+worker_kind = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+if worker_kind not in WORKER_CLASSES:
+    raise RuntimeError(f"WEB_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {worker_kind!r}")
+if worker_kind == 'uvicorn' and importlib.util.find_spec('uvicorn_worker') is None:
+    raise RuntimeError("WEB_WORKER_CLASS=uvicorn needs the uvicorn-worker package: pip install uvicorn-worker")
+
+cpus, memory = cpu_limit(), memory_limit()
+sized_workers, sized_threads = worker_sizing(worker_kind, cpus, memory)
+
+worker_class = WORKER_CLASSES[worker_kind]
+workers = _env_int('WEB_CONCURRENCY', sized_workers)
+threads = _env_int('GUNICORN_THREADS', sized_threads) if worker_kind == 'gthread' else 1
+
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ['GUNICORN_THREADS'] = str(threads)
+
+# The uvicorn worker serves the ASGI application
+wsgi_app = 'cyclesync.asgi:application' if worker_kind == 'uvicorn' else 'cyclesync.wsgi:application'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Off by default: preloading saves memory and start up time, but the load test measured a worse
+# median latency with it (152 ms against 92 ms). Safe to turn on, as cyclesync/preload.py closes
+# connections before forking and workers recreate their thread pools and throttle store.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+# Ignored by sync workers, which close the connection after every response
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = timeout
+
+# Worker heartbeat files on tmpfs, so a slow container disk cannot get workers killed
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def on_starting(server):
+    server.log.info(
+        "%s: %d worker(s) x %d thread(s) (%d CPU(s), %d MiB memory, preload %s)",
+        worker_kind, workers, threads, cpus, memory // (1024 * 1024), 'on' if preload_app else 'off',
+    )